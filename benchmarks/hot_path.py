@@ -0,0 +1,199 @@
+"""
+Times each step between a suds reply and stdout on 5000-row pages,
+and checks them against a saved baseline.
+"""
+import argparse
+import io
+import json
+import sys
+import time
+
+import singer
+import suds.sudsobject
+
+from benchmarks.pages import activity_page, contact_page, selected
+from benchmarks.transform import flatten
+from tap_bronto.ids import ActivityIds
+from tap_bronto.output import Writer
+from tap_bronto.schemas import get_field_selector, get_transformer, \
+    ACTIVITY_SCHEMA, CONTACT_SCHEMA
+from tap_bronto.state import incorporate, StateManager
+
+
+class Step:
+    """
+    One hot-path step: `prepare` builds an untimed input page, `run` is
+    timed processing it.
+    """
+
+    def __init__(self, name, prepare, run):
+        self.name = name
+        self.prepare = prepare
+        self.run = run
+
+    def measure(self, repeat):
+        timings = []
+
+        for _ in range(repeat):
+            page = self.prepare()
+
+            started = time.perf_counter()
+            self.run(page)
+            timings.append(time.perf_counter() - started)
+
+            rows = len(page)
+
+        best = min(timings)
+
+        return {
+            'rows_per_second': round(rows / best),
+            'microseconds_per_row': round(best / rows * 1e6, 3),
+        }
+
+
+class NullOutput(io.TextIOBase):
+
+    def write(self, data):
+        return len(data)
+
+
+class NullBinaryOutput(io.RawIOBase):
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return len(data)
+
+
+def to_stdout(run):
+    """
+    Runs `run` with stdout, text and binary, sent nowhere.
+    """
+    def quiet(page):
+        stdout = sys.stdout
+        sys.stdout = NullOutput()
+        sys.stdout.buffer = NullBinaryOutput()
+
+        try:
+            run(page)
+        finally:
+            sys.stdout = stdout
+
+    return quiet
+
+
+def steps():
+    contacts = contact_page()
+    activities = activity_page()
+
+    contact_schema = selected(CONTACT_SCHEMA)
+    activity_schema = selected(ACTIVITY_SCHEMA)
+
+    select = get_field_selector(contact_schema)
+    transform_contact = get_transformer(contact_schema,
+                                        flatten=['readOnlyContactData'])
+    transform_activity = get_transformer(activity_schema)
+
+    def contact_dicts():
+        return [suds.sudsobject.asdict(result) for result in contacts]
+
+    def flat_contacts():
+        return [flatten(item) for item in contact_dicts()]
+
+    def activity_records():
+        return [transform_activity(result) for result in activities]
+
+    def contact_records():
+        return [transform_contact(result) for result in contacts]
+
+    def bookmark_values():
+        return [record['createdDate'] for record in activity_records()]
+
+    def incorporate_all(values):
+        state = {}
+
+        for value in values:
+            state = incorporate(state, 'outbound_activity', 'createdDate',
+                                value)
+
+    def checkpoint_all(values):
+        manager = StateManager(checkpoint_seconds=60)
+
+        for value in values:
+            manager.incorporate('outbound_activity', 'createdDate', value)
+            manager.checkpoint()
+
+    writer = Writer(encoder='json')
+
+    return [
+        Step('asdict', lambda: contacts,
+             lambda page: [suds.sudsobject.asdict(result)
+                           for result in page]),
+        Step('flatten', contact_dicts,
+             lambda page: [flatten(item) for item in page]),
+        Step('select', flat_contacts,
+             lambda page: [select(item) for item in page]),
+        Step('compiled_transform', lambda: contacts,
+             lambda page: [transform_contact(result) for result in page]),
+        Step('activity_ids', activity_records,
+             lambda page: ActivityIds()(page)),
+        Step('state_incorporate', bookmark_values, incorporate_all),
+        Step('state_checkpoint', bookmark_values, checkpoint_all),
+        Step('singer_write_records', contact_records,
+             to_stdout(lambda page: singer.write_records('contact', page))),
+        Step('writer_write_records', contact_records,
+             to_stdout(lambda page: (writer.write_records('contact', page),
+                                     writer.flush()))),
+    ]
+
+
+def check(results, baseline, tolerance):
+    regressions = []
+
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        before = baseline[name]['microseconds_per_row']
+        after = result['microseconds_per_row']
+
+        if after > before * (1 + tolerance):
+            regressions.append('{}: {} -> {} us/row ({:+.0%})'.format(
+                name, before, after, after / before - 1))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', help='Write the results to this file')
+    parser.add_argument('--check',
+                        help='Compare the results to this baseline, exiting '
+                             'with status 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='How much slower per row a step may get')
+    args = parser.parse_args()
+
+    results = {step.name: step.measure(args.repeat) for step in steps()}
+
+    print(json.dumps(results, indent=2))
+
+    if args.save:
+        with open(args.save, 'w') as handle:
+            json.dump(results, handle, indent=2)
+
+    if args.check:
+        with open(args.check) as handle:
+            regressions = check(results, json.load(handle), args.tolerance)
+
+        for regression in regressions:
+            print('Regression in {}'.format(regression), file=sys.stderr)
+
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
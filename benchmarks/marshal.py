@@ -0,0 +1,135 @@
+"""
+Compares building a page request with suds against filling in an
+EnvelopeTemplate.
+"""
+import argparse
+import json
+import time
+
+from datetime import datetime, timedelta
+
+import pytz
+
+from suds.plugin import PluginContainer
+
+from tap_bronto.client import ClientPool
+from tap_bronto.envelope import EnvelopeTemplate, Variable
+from tap_bronto.session import session_header
+
+
+SESSION_ID = 'benchmark-session'
+
+START = datetime(2017, 1, 1, tzinfo=pytz.utc)
+END = START + timedelta(hours=1)
+
+
+def contact_request(client, page):
+    start_filter = client.factory.create('dateValue')
+    start_filter.value = START
+    start_filter.operator = 'AfterOrSameDay'
+
+    end_filter = client.factory.create('dateValue')
+    end_filter.value = END
+    end_filter.operator = 'Before'
+
+    _filter = client.factory.create('contactFilter')
+    _filter.type = 'AND'
+    _filter.modified = [start_filter, end_filter]
+
+    return (), {
+        'filter': _filter,
+        'includeLists': True,
+        'fields': [],
+        'pageNumber': page,
+        'includeSMSKeywords': True,
+        'includeGeoIpData': True,
+        'includeTechnologyData': True,
+        'includeRFMData': True,
+        'includeEngagementData': True,
+    }
+
+
+def activity_request(client, page):
+    _filter = client.factory.create('recentOutboundActivitySearchRequest')
+    _filter.start = START
+    _filter.end = END
+    _filter.size = 5000
+    _filter.readDirection = page
+
+    return (_filter,), {}
+
+
+def unsubscribe_request(client, page):
+    _filter = client.factory.create('unsubscribeFilter')
+    _filter.start = START
+    _filter.end = END
+
+    return (_filter, page), {}
+
+
+OPERATIONS = [
+    ('readContacts', contact_request, 'pageNumber', 2),
+    ('readRecentOutboundActivities', activity_request,
+     'readDirection', 'NEXT'),
+    ('readUnsubscribes', unsubscribe_request, 'pageNumber', 2),
+]
+
+
+def marshal(client, operation, args, kwargs):
+    method = getattr(client.service, operation).method
+    envelope = method.binding.input.get_message(method, args, kwargs)
+
+    PluginContainer(client.options.plugins).message.marshalled(
+        envelope=envelope.root())
+
+    return envelope.plain().encode('utf-8')
+
+
+def per_request(function, runs):
+    started = time.perf_counter()
+
+    for _ in range(runs):
+        function()
+
+    return (time.perf_counter() - started) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--wsdl', required=True)
+    parser.add_argument('--runs', type=int, default=2000)
+    args = parser.parse_args()
+
+    client = ClientPool(args.wsdl).client()
+    session_header(client).session_id = SESSION_ID
+
+    results = {}
+
+    for operation, build, name, value in OPERATIONS:
+        call_args, call_kwargs = build(client, value)
+
+        template_args, template_kwargs = build(client, Variable(name))
+        template = EnvelopeTemplate(client, operation, template_args,
+                                    template_kwargs)
+        values = {name: value, 'sessionId': SESSION_ID}
+
+        assert template.render(values) == marshal(
+            client, operation, call_args, call_kwargs)
+
+        suds_seconds = per_request(
+            lambda: marshal(client, operation, call_args, call_kwargs),
+            args.runs)
+        template_seconds = per_request(
+            lambda: template.render(values), args.runs)
+
+        results[operation] = {
+            'suds_us_per_request': round(suds_seconds * 1e6, 1),
+            'template_us_per_request': round(template_seconds * 1e6, 1),
+            'speedup': round(suds_seconds / template_seconds, 1),
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,663 @@
+"""
+A stand-in for the Bronto v4 SOAP API, serving deterministic data for
+running the tap end to end.
+"""
+import argparse
+import gzip
+import threading
+import time
+import uuid
+
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+
+NAMESPACE = 'http://api.bronto.com/v4'
+SOAP_NAMESPACE = 'http://schemas.xmlsoap.org/soap/envelope/'
+
+EPOCH = datetime(2017, 1, 1, tzinfo=timezone.utc)
+
+ACTIVITY_TYPES = ('send', 'open', 'click', 'bounce')
+
+# Fault Bronto returns when a readRecent*Activities cursor is exhausted.
+END_OF_RESULTS = 116
+INVALID_SESSION = 102
+
+
+class Options:
+    """
+    How much data the server generates and how slowly it answers.
+    """
+
+    def __init__(self, contacts_per_day=100, activities_per_hour=50,
+                 unsubscribes_per_day=10, lists=20, page_size=5000,
+                 latency=0.0, gzip=True):
+        self.contacts_per_day = contacts_per_day
+        self.activities_per_hour = activities_per_hour
+        self.unsubscribes_per_day = unsubscribes_per_day
+        self.lists = lists
+        self.page_size = page_size
+        self.latency = latency
+        self.gzip = gzip
+
+
+# WSDL
+
+CONTACT_FIELDS = ['id', 'email', 'mobileNumber', 'status', 'msgPref',
+                  'source', 'customSource']
+
+READ_ONLY_NUMBERS = ['numSends', 'numBounces', 'numOpens', 'numClicks',
+                     'numConversions', 'conversionAmount', 'lastOrderTotal',
+                     'totalOrders', 'totalRevenue', 'averageOrderValue']
+
+READ_ONLY_STRINGS = ['geoIPCity', 'geoIPStateRegion', 'geoIPZip',
+                     'geoIPCountry', 'geoIPCountryCode', 'primaryBrowser',
+                     'mobileBrowser', 'primaryEmailClient',
+                     'mobileEmailClient', 'operatingSystem']
+
+READ_ONLY_DATES = ['firstOrderDate', 'lastOrderDate', 'lastDeliveryDate',
+                   'lastOpenDate', 'lastClickDate']
+
+ACTIVITY_FIELDS = [
+    'contactId', 'activityType', 'listId', 'segmentId', 'keywordId',
+    'messageId', 'deliveryId', 'workflowId', 'emailAddress', 'mobileNumber',
+    'contactStatus', 'messageName', 'deliveryType', 'workflowName',
+    'segmentName', 'listName', 'listLabel', 'automatorName',
+    'smsKeywordName', 'bounceType', 'bounceReason', 'skipReason',
+    'linkName', 'linkUrl', 'orderId', 'unsubscribeMethod', 'ftafEmails',
+    'socialNetwork', 'socialActivity', 'webformId', 'webformAction',
+    'webformName']
+
+DIRECTIONS = ['Inbound', 'Outbound']
+
+
+def schema_element(name, type_name, many=False):
+    occurs = 'minOccurs="0"'
+
+    if many:
+        occurs += ' maxOccurs="unbounded"'
+
+    return '<xs:element name="{}" type="{}" {}/>'.format(
+        name, type_name, occurs)
+
+
+def complex_type(name, elements):
+    return ('<xs:complexType name="{}"><xs:sequence>{}</xs:sequence>'
+            '</xs:complexType>'.format(name, ''.join(elements)))
+
+
+def strings(names):
+    return [schema_element(name, 'xs:string') for name in names]
+
+
+def enumeration(name, values):
+    return ('<xs:simpleType name="{}"><xs:restriction base="xs:string">{}'
+            '</xs:restriction></xs:simpleType>'.format(name, ''.join(
+                '<xs:enumeration value="{}"/>'.format(value)
+                for value in values)))
+
+
+TYPES = [
+    enumeration('activityType', ACTIVITY_TYPES),
+    complex_type('sessionHeader', strings(['sessionId'])),
+    complex_type('dateValue', [
+        schema_element('operator', 'xs:string'),
+        schema_element('value', 'xs:dateTime')]),
+    complex_type('contactFilter', [
+        schema_element('type', 'xs:string'),
+        schema_element('modified', 'tns:dateValue', many=True)]),
+    complex_type('unsubscribeFilter', [
+        schema_element('start', 'xs:dateTime'),
+        schema_element('end', 'xs:dateTime')]),
+    complex_type('readOnlyContactData', [
+        schema_element(name, 'xs:double') for name in READ_ONLY_NUMBERS
+    ] + strings(READ_ONLY_STRINGS) + [
+        schema_element(name, 'xs:dateTime') for name in READ_ONLY_DATES]),
+    complex_type('contactObject', strings(CONTACT_FIELDS) + [
+        schema_element('created', 'xs:dateTime'),
+        schema_element('modified', 'xs:dateTime'),
+        schema_element('deleted', 'xs:boolean'),
+        schema_element('listIds', 'xs:string', many=True),
+        schema_element('SMSKeywordIDs', 'xs:string', many=True),
+        schema_element('readOnlyContactData', 'tns:readOnlyContactData')]),
+    complex_type('mailListObject', strings(['id', 'name', 'label']) + [
+        schema_element('activeCount', 'xs:long'),
+        schema_element('status', 'xs:string')]),
+    complex_type('unsubscribeObject', strings([
+        'contactId', 'deliveryId', 'method', 'complaint']) + [
+        schema_element('created', 'xs:dateTime')]),
+    complex_type('ApiException', [schema_element('errorCode', 'xs:int')]),
+]
+
+for direction in DIRECTIONS:
+    TYPES.append(complex_type(
+        'recent{}ActivitySearchRequest'.format(direction), [
+            schema_element('start', 'xs:dateTime'),
+            schema_element('end', 'xs:dateTime'),
+            schema_element('size', 'xs:int'),
+            schema_element('readDirection', 'xs:string'),
+            schema_element('types', 'tns:activityType', many=True)]))
+
+    TYPES.append(complex_type(
+        'recent{}ActivityObject'.format(direction),
+        [schema_element('createdDate', 'xs:dateTime')] +
+        strings(ACTIVITY_FIELDS) +
+        [schema_element('deliveryStart', 'xs:dateTime')]))
+
+# Operation name: (request elements, return type).
+OPERATIONS = {
+    'login': (
+        [schema_element('apiToken', 'xs:string')], 'xs:string'),
+    'readContacts': ([
+        schema_element('filter', 'tns:contactFilter'),
+        schema_element('includeLists', 'xs:boolean'),
+        schema_element('fields', 'xs:string', many=True),
+        schema_element('pageNumber', 'xs:int'),
+        schema_element('includeSMSKeywords', 'xs:boolean'),
+        schema_element('includeGeoIpData', 'xs:boolean'),
+        schema_element('includeTechnologyData', 'xs:boolean'),
+        schema_element('includeRFMData', 'xs:boolean'),
+        schema_element('includeEngagementData', 'xs:boolean'),
+    ], 'tns:contactObject'),
+    'readLists': ([
+        schema_element('filter', 'xs:string'),
+        schema_element('pageNumber', 'xs:int'),
+        schema_element('pageSize', 'xs:int'),
+    ], 'tns:mailListObject'),
+    'readUnsubscribes': ([
+        schema_element('filter', 'tns:unsubscribeFilter'),
+        schema_element('pageNumber', 'xs:int'),
+    ], 'tns:unsubscribeObject'),
+}
+
+for direction in DIRECTIONS:
+    OPERATIONS['readRecent{}Activities'.format(direction)] = (
+        [schema_element(
+            'filter', 'tns:recent{}ActivitySearchRequest'.format(direction))],
+        'tns:recent{}ActivityObject'.format(direction))
+
+
+def build_wsdl(location):
+    elements = [
+        '<xs:element name="sessionHeader" type="tns:sessionHeader"/>',
+        '<xs:element name="ApiException" type="tns:ApiException"/>',
+    ]
+    types = list(TYPES)
+    messages = [
+        '<wsdl:message name="sessionHeader"><wsdl:part '
+        'name="sessionHeader" element="tns:sessionHeader"/></wsdl:message>',
+        '<wsdl:message name="ApiException"><wsdl:part name="fault" '
+        'element="tns:ApiException"/></wsdl:message>',
+    ]
+    ports = []
+    bindings = []
+
+    for operation, (arguments, return_type) in OPERATIONS.items():
+        response = operation + 'Response'
+        many = operation != 'login'
+
+        types.append(complex_type(operation, arguments))
+        types.append(complex_type(response, [
+            schema_element('return', return_type, many=many)]))
+
+        for name in (operation, response):
+            elements.append('<xs:element name="{0}" type="tns:{0}"/>'
+                            .format(name))
+            messages.append(
+                '<wsdl:message name="{0}"><wsdl:part name="parameters" '
+                'element="tns:{0}"/></wsdl:message>'.format(name))
+
+        ports.append(
+            '<wsdl:operation name="{0}"><wsdl:input message="tns:{0}"/>'
+            '<wsdl:output message="tns:{0}Response"/><wsdl:fault '
+            'name="ApiException" message="tns:ApiException"/>'
+            '</wsdl:operation>'.format(operation))
+
+        header = ''
+
+        if operation != 'login':
+            header = ('<soap:header message="tns:sessionHeader" '
+                      'part="sessionHeader" use="literal"/>')
+
+        bindings.append(
+            '<wsdl:operation name="{}"><soap:operation soapAction=""/>'
+            '<wsdl:input>{}<soap:body use="literal"/></wsdl:input>'
+            '<wsdl:output><soap:body use="literal"/></wsdl:output>'
+            '<wsdl:fault name="ApiException"><soap:fault '
+            'name="ApiException" use="literal"/></wsdl:fault>'
+            '</wsdl:operation>'.format(operation, header))
+
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<wsdl:definitions name="BrontoSoapApiImplService" '
+        'targetNamespace="{ns}" xmlns:tns="{ns}" '
+        'xmlns:wsdl="http://schemas.xmlsoap.org/wsdl/" '
+        'xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/" '
+        'xmlns:xs="http://www.w3.org/2001/XMLSchema">\n'
+        '<wsdl:types><xs:schema targetNamespace="{ns}" '
+        'elementFormDefault="unqualified" xmlns:tns="{ns}">\n'
+        '{elements}\n{types}\n</xs:schema></wsdl:types>\n'
+        '{messages}\n'
+        '<wsdl:portType name="BrontoSoapPortType">{ports}</wsdl:portType>\n'
+        '<wsdl:binding name="BrontoSoapApiImplServiceSoapBinding" '
+        'type="tns:BrontoSoapPortType"><soap:binding style="document" '
+        'transport="http://schemas.xmlsoap.org/soap/http"/>{bindings}'
+        '</wsdl:binding>\n'
+        '<wsdl:service name="BrontoSoapApiImplService"><wsdl:port '
+        'name="BrontoSoapApiImplPort" '
+        'binding="tns:BrontoSoapApiImplServiceSoapBinding">'
+        '<soap:address location="{location}"/></wsdl:port>'
+        '</wsdl:service>\n</wsdl:definitions>\n').format(
+            ns=NAMESPACE,
+            elements='\n'.join(elements),
+            types='\n'.join(types),
+            messages='\n'.join(messages),
+            ports=''.join(ports),
+            bindings=''.join(bindings),
+            location=location)
+
+
+# Data
+
+def parse_date(value):
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+
+    return parsed
+
+
+def format_date(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+def midnight(value):
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def timestamps(start, end, per_second):
+    """
+    Yields `(index, time)` for every record between `start` and `end`,
+    at `per_second` records a second since EPOCH, never in the future.
+    """
+    if per_second <= 0:
+        return
+
+    step = 1.0 / per_second
+    end = min(end, datetime.now(timezone.utc))
+    index = int(max(0, (start - EPOCH).total_seconds()) // step)
+
+    while True:
+        value = EPOCH + timedelta(seconds=index * step)
+
+        if value >= end:
+            return
+
+        if value >= start:
+            yield index, value
+
+        index += 1
+
+
+def element(name, value):
+    if value is None:
+        return ''
+
+    return '<{0}>{1}</{0}>'.format(name, escape(str(value)))
+
+
+def contact(index, modified):
+    read_only = ''.join([
+        element('numSends', index % 7),
+        element('numOpens', index % 5),
+        element('geoIPCity', 'City {}'.format(index % 50)),
+        element('lastOpenDate', format_date(modified)),
+    ])
+
+    return ''.join([
+        element('id', 'c{:08d}'.format(index)),
+        element('email', 'user{}@example.com'.format(index)),
+        element('status', 'active'),
+        element('created', format_date(modified - timedelta(days=30))),
+        element('modified', format_date(modified)),
+        element('deleted', 'false'),
+        element('listIds', 'l1'),
+        element('listIds', 'l2'),
+        '<readOnlyContactData>{}</readOnlyContactData>'.format(read_only),
+    ])
+
+
+def activity(index, created):
+    return ''.join([
+        element('createdDate', format_date(created)),
+        element('contactId', 'c{:08d}'.format(index % 100000)),
+        element('activityType', activity_type(index)),
+        element('listId', 'l{}'.format(index % 20)),
+        element('messageId', 'm{}'.format(index % 30)),
+        element('deliveryId', 'd{}'.format(index % 300)),
+        element('emailAddress', 'user{}@example.com'.format(index)),
+        element('messageName', 'Message {}'.format(index % 30)),
+        element('deliveryStart', format_date(created)),
+    ])
+
+
+def activity_type(index):
+    return ACTIVITY_TYPES[index % len(ACTIVITY_TYPES)]
+
+
+def unsubscribe(index, created):
+    return ''.join([
+        element('contactId', 'c{:08d}'.format(index)),
+        element('method', 'subscriber'),
+        element('created', format_date(created)),
+    ])
+
+
+def mail_list(index):
+    return ''.join([
+        element('id', 'l{}'.format(index)),
+        element('name', 'List {}'.format(index)),
+        element('label', 'Label {}'.format(index)),
+        element('activeCount', index * 10),
+        element('status', 'active'),
+    ])
+
+
+# Server
+
+class Stats:
+    """
+    Requests and response bytes per operation, before compression.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.operations = {}
+
+    def record(self, operation, size):
+        with self.lock:
+            stats = self.operations.setdefault(
+                operation, {'requests': 0, 'bytes': 0})
+            stats['requests'] += 1
+            stats['bytes'] += size
+
+    def snapshot(self):
+        with self.lock:
+            return {operation: dict(stats)
+                    for operation, stats in self.operations.items()}
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def options(self):
+        return self.server.options
+
+    def send_body(self, status, body, operation=None):
+        body = body.encode('utf-8')
+
+        if operation is not None:
+            self.server.stats.record(operation, len(body))
+
+        headers = {'Content-Type': 'text/xml; charset=utf-8'}
+
+        if self.options.gzip and \
+                'gzip' in (self.headers.get('Accept-Encoding') or ''):
+            body = gzip.compress(body, 1)
+            headers['Content-Encoding'] = 'gzip'
+
+        headers['Content-Length'] = str(len(body))
+
+        self.send_response(status)
+
+        for name, value in headers.items():
+            self.send_header(name, value)
+
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.send_body(200, build_wsdl(
+            'http://{}/v4'.format(self.headers.get('Host'))), 'wsdl')
+
+    def fault(self, operation, code, message):
+        self.send_body(500, (
+            '<soap:Envelope xmlns:soap="{}"><soap:Body><soap:Fault>'
+            '<faultcode>soap:Server</faultcode><faultstring>{}: {}'
+            '</faultstring><detail><ns2:ApiException xmlns:ns2="{}">'
+            '<errorCode>{}</errorCode></ns2:ApiException></detail>'
+            '</soap:Fault></soap:Body></soap:Envelope>').format(
+                SOAP_NAMESPACE, code, message, NAMESPACE, code),
+            operation)
+
+    def respond(self, operation, rows):
+        self.send_body(200, (
+            '<soap:Envelope xmlns:soap="{0}"><soap:Body>'
+            '<ns2:{1}Response xmlns:ns2="{2}">{3}</ns2:{1}Response>'
+            '</soap:Body></soap:Envelope>').format(
+                SOAP_NAMESPACE, operation, NAMESPACE,
+                ''.join('<return>{}</return>'.format(row)
+                        for row in rows)),
+            operation)
+
+    def do_POST(self):
+        data = self.rfile.read(int(self.headers['Content-Length']))
+
+        if self.options.latency:
+            time.sleep(self.options.latency)
+
+        envelope = ElementTree.fromstring(data)
+        body = envelope.find('{{{}}}Body'.format(SOAP_NAMESPACE))[0]
+        operation = body.tag.split('}')[-1]
+        arguments = {child.tag.split('}')[-1]: child for child in body}
+
+        if operation == 'login':
+            session_id = str(uuid.uuid4())
+            self.server.sessions.add(session_id)
+            return self.respond(operation, [escape(session_id)])
+
+        session_id = envelope.find('.//{{{}}}sessionHeader/sessionId'
+                                   .format(NAMESPACE))
+
+        if session_id is None:
+            session_id = envelope.find('.//sessionId')
+
+        if session_id is None or \
+                session_id.text not in self.server.sessions:
+            return self.fault(operation, INVALID_SESSION, 'Invalid session')
+
+        handler = getattr(self, operation, None)
+
+        if operation not in OPERATIONS or handler is None:
+            return self.fault(operation, 101, 'Unknown operation')
+
+        handler(operation, arguments, session_id.text)
+
+    def page(self, rows, page_number):
+        size = self.options.page_size
+        return rows[(page_number - 1) * size:page_number * size]
+
+    def readLists(self, operation, arguments, session_id):
+        page_number = int(arguments['pageNumber'].text)
+        size = self.options.page_size
+
+        if 'pageSize' in arguments:
+            size = int(arguments['pageSize'].text)
+
+        indexes = range((page_number - 1) * size,
+                        min(page_number * size, self.options.lists))
+
+        self.respond(operation, [mail_list(index) for index in indexes])
+
+    def readContacts(self, operation, arguments, session_id):
+        # Like Bronto, only compares the dates of a contact filter.
+        start = end = None
+
+        for value in arguments['filter'].findall('modified'):
+            day = midnight(parse_date(value.find('value').text))
+
+            if value.find('operator').text == 'AfterOrSameDay':
+                start = day
+            else:
+                end = day
+
+        rows = list(timestamps(start, end,
+                               self.options.contacts_per_day / 86400.0))
+
+        self.respond(operation, [
+            contact(index, modified) for index, modified
+            in self.page(rows, int(arguments['pageNumber'].text))])
+
+    def readUnsubscribes(self, operation, arguments, session_id):
+        _filter = arguments['filter']
+
+        rows = list(timestamps(
+            parse_date(_filter.find('start').text),
+            parse_date(_filter.find('end').text),
+            self.options.unsubscribes_per_day / 86400.0))
+
+        self.respond(operation, [
+            unsubscribe(index, created) for index, created
+            in self.page(rows, int(arguments['pageNumber'].text))])
+
+    def readRecentActivities(self, operation, arguments, session_id):
+        """
+        readDirection FIRST opens a cursor over the filter, NEXT pages
+        through it, and an exhausted cursor answers with fault 116.
+        """
+        _filter = arguments['filter']
+        key = (session_id, operation)
+        cursors = self.server.cursors
+
+        if _filter.find('readDirection').text == 'FIRST':
+            size = _filter.find('size')
+            cursors[key] = {
+                'start': parse_date(_filter.find('start').text),
+                'end': parse_date(_filter.find('end').text),
+                'size': int(size.text) if size is not None else 5000,
+                'types': set(types.text
+                             for types in _filter.findall('types')),
+            }
+
+        cursor = cursors.get(key)
+
+        if cursor is None:
+            return self.fault(operation, END_OF_RESULTS, 'End of results')
+
+        rows = []
+
+        for index, created in timestamps(
+                cursor['start'], cursor['end'],
+                self.options.activities_per_hour / 3600.0):
+            if cursor['types'] and \
+                    activity_type(index) not in cursor['types']:
+                continue
+
+            rows.append(activity(index, created))
+
+            if len(rows) >= cursor['size']:
+                break
+
+        if not rows:
+            del cursors[key]
+            return self.fault(operation, END_OF_RESULTS, 'End of results')
+
+        cursor['start'] = created + timedelta(microseconds=1)
+
+        self.respond(operation, rows)
+
+    readRecentInboundActivities = readRecentActivities
+    readRecentOutboundActivities = readRecentActivities
+
+
+class MockServer(ThreadingHTTPServer):
+    """
+    The mock API on `port` (0 picks a free one). Use start() to serve
+    it from a background thread.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, options=None):
+        super().__init__(('127.0.0.1', port), Handler)
+
+        self.options = options or Options()
+        self.stats = Stats()
+        self.sessions = set()
+        self.cursors = {}
+        self.thread = None
+
+    @property
+    def wsdl_url(self):
+        return 'http://127.0.0.1:{}/v4?wsdl'.format(self.server_address[1])
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever,
+                                       name='mock-bronto', daemon=True)
+        self.thread.start()
+
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def add_options(parser):
+    defaults = Options()
+
+    parser.add_argument('--contacts-per-day', type=float,
+                        default=defaults.contacts_per_day)
+    parser.add_argument('--activities-per-hour', type=float,
+                        default=defaults.activities_per_hour)
+    parser.add_argument('--unsubscribes-per-day', type=float,
+                        default=defaults.unsubscribes_per_day)
+    parser.add_argument('--lists', type=int, default=defaults.lists)
+    parser.add_argument('--page-size', type=int,
+                        default=defaults.page_size)
+    parser.add_argument('--latency', type=float, default=defaults.latency,
+                        help='Seconds to wait before answering a request')
+    parser.add_argument('--no-gzip', action='store_true',
+                        help='Never compress replies')
+
+
+def options_from_args(args):
+    return Options(
+        contacts_per_day=args.contacts_per_day,
+        activities_per_hour=args.activities_per_hour,
+        unsubscribes_per_day=args.unsubscribes_per_day,
+        lists=args.lists,
+        page_size=args.page_size,
+        latency=args.latency,
+        gzip=not args.no_gzip)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8999)
+    add_options(parser)
+    args = parser.parse_args()
+
+    server = MockServer(args.port, options_from_args(args))
+
+    print('Serving the mock Bronto API, WSDL at {}'.format(
+        server.wsdl_url))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
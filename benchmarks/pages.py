@@ -0,0 +1,112 @@
+"""
+Synthetic Bronto result pages, built as the suds objects a real
+read* call would return, or as the raw SOAP reply it would receive.
+"""
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import escape
+
+from suds.sudsobject import Factory
+
+
+PAGE_SIZE = 5000
+
+START = datetime(2018, 1, 1, tzinfo=timezone.utc)
+
+ACTIVITY_TYPES = ['send', 'open', 'click', 'bounce']
+
+
+def activity(index):
+    created = START + timedelta(seconds=index)
+
+    return Factory.object('recentOutboundActivityObject', {
+        'createdDate': created,
+        'contactId': 'c{:08d}'.format(index % 100000),
+        'activityType': ACTIVITY_TYPES[index % len(ACTIVITY_TYPES)],
+        'listId': 'l{}'.format(index % 20),
+        'messageId': 'm{}'.format(index % 30),
+        'deliveryId': 'd{}'.format(index % 300),
+        'emailAddress': 'user{}@example.com'.format(index),
+        'messageName': 'Message {}'.format(index % 30),
+        'deliveryStart': created,
+    })
+
+
+def contact(index):
+    modified = START + timedelta(seconds=index)
+
+    return Factory.object('contactObject', {
+        'id': 'c{:08d}'.format(index),
+        'email': 'user{}@example.com'.format(index),
+        'status': 'active',
+        'created': modified - timedelta(days=30),
+        'modified': modified,
+        'deleted': False,
+        'listIds': ['l1', 'l2'],
+        'readOnlyContactData': Factory.object('readOnlyContactData', {
+            'numSends': float(index % 7),
+            'numOpens': float(index % 5),
+            'geoIPCity': 'City {}'.format(index % 50),
+            'lastOpenDate': modified,
+        }),
+    })
+
+
+def activity_page(size=PAGE_SIZE, offset=0):
+    return [activity(offset + index) for index in range(size)]
+
+
+def contact_page(size=PAGE_SIZE, offset=0):
+    return [contact(offset + index) for index in range(size)]
+
+
+def element_xml(result):
+    fields = []
+
+    for name, value in result.__dict__.items():
+        if name.startswith('__'):
+            continue
+
+        for item in value if isinstance(value, list) else [value]:
+            if hasattr(item, '__keylist__'):
+                item = element_xml(item)
+            elif isinstance(item, datetime):
+                item = item.isoformat()
+            elif isinstance(item, bool):
+                item = str(item).lower()
+            else:
+                item = escape(str(item))
+
+            fields.append('<{0}>{1}</{0}>'.format(name, item))
+
+    return ''.join(fields)
+
+
+def reply(operation, page):
+    """
+    The raw SOAP reply a read* operation would have returned `page` in.
+    """
+    rows = ''.join('<return>{}</return>'.format(element_xml(result))
+                   for result in page)
+
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<soap:Envelope '
+        'xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">'
+        '<soap:Body><ns2:{0}Response xmlns:ns2="http://api.bronto.com/v4">'
+        '{1}</ns2:{0}Response></soap:Body></soap:Envelope>'
+        .format(operation, rows)).encode('utf-8')
+
+
+def selected(schema):
+    """
+    A catalog schema with every field selected.
+    """
+    properties = {}
+
+    for field, field_schema in schema['properties'].items():
+        metadata = dict(field_schema.get('metadata', {}))
+        metadata.setdefault('inclusion', 'available')
+        metadata['selected'] = True
+        properties[field] = dict(field_schema, metadata=metadata)
+
+    return dict(schema, properties=properties)
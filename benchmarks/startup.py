@@ -0,0 +1,51 @@
+"""
+Times getting a usable SOAP client, with and without the WSDL cache.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+
+
+BUILD = """
+import time
+from tap_bronto.client import ClientPool
+pool = ClientPool({wsdl!r})
+pool.configure({config!r})
+started = time.monotonic()
+pool.base()
+print(time.monotonic() - started)
+"""
+
+
+def time_build(wsdl, config):
+    output = subprocess.check_output(
+        [sys.executable, '-c', BUILD.format(wsdl=wsdl, config=config)],
+        stderr=subprocess.DEVNULL)
+
+    return float(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--wsdl', required=True)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        uncached = [time_build(args.wsdl, {}) for _ in range(args.runs)]
+
+        cold = time_build(args.wsdl, {'wsdl_cache': cache_dir})
+        warm = [time_build(args.wsdl, {'wsdl_cache': cache_dir})
+                for _ in range(args.runs)]
+
+    print(json.dumps({
+        'uncached_seconds': min(uncached),
+        'cache_cold_seconds': cold,
+        'cache_warm_seconds': min(warm),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Runs the tap against the mock API, one stream at a time, and reports
+records/sec, requests, bytes and peak RSS.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.mock_server import MockServer, add_options, \
+    options_from_args
+from benchmarks.pages import selected
+from tap_bronto import AVAILABLE_STREAM_ACCESSORS
+
+
+RECORD = b'{"type": "RECORD"'
+
+TAP = 'from tap_bronto import main; main()'
+
+
+def catalog_entry(stream_accessor):
+    entry = stream_accessor({}).generate_catalog()[0]
+    schema = selected(entry['schema'])
+    schema['metadata'] = {'inclusion': 'available', 'selected': True}
+
+    return dict(entry, schema=schema,
+                metadata=dict(entry['metadata'], selected=True))
+
+
+def count_records(output):
+    """
+    Reads the tap's output to the end, returning how many RECORD
+    messages and bytes it held.
+    """
+    records = 0
+    size = 0
+    tail = b''
+
+    while True:
+        chunk = output.read(1024 * 1024)
+
+        if not chunk:
+            return records, size
+
+        size += len(chunk)
+        data = tail + chunk
+        records += data.count(RECORD)
+
+        # Too short to hold a whole prefix, but it may hold the start of
+        # one that the next chunk completes.
+        tail = data[-(len(RECORD) - 1):]
+
+
+def run_stream(server, directory, entry, settings):
+    config_path = os.path.join(directory, 'config.json')
+    catalog_path = os.path.join(directory, 'catalog.json')
+
+    with open(config_path, 'w') as handle:
+        json.dump(settings, handle)
+
+    with open(catalog_path, 'w') as handle:
+        json.dump({'streams': [entry]}, handle)
+
+    requests_before = server.stats.snapshot()
+    started = time.perf_counter()
+
+    process = subprocess.Popen(
+        [sys.executable, '-c', TAP, '-c', config_path, '-p', catalog_path],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    records, output_bytes = count_records(process.stdout)
+
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    seconds = time.perf_counter() - started
+
+    if process.returncode != 0:
+        raise RuntimeError('{} failed with exit code {}'.format(
+            entry['stream'], process.returncode))
+
+    requests = 0
+    response_bytes = 0
+
+    for operation, stats in server.stats.snapshot().items():
+        before = requests_before.get(operation, {'requests': 0, 'bytes': 0})
+        requests += stats['requests'] - before['requests']
+        response_bytes += stats['bytes'] - before['bytes']
+
+    return {
+        'records': records,
+        'seconds': round(seconds, 3),
+        'records_per_second': round(records / seconds),
+        'requests': requests,
+        'response_bytes': response_bytes,
+        'output_bytes': output_bytes,
+        # ru_maxrss is in kilobytes on Linux.
+        'peak_rss_mb': round(usage.ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    streams = [stream_accessor.TABLE
+               for stream_accessor in AVAILABLE_STREAM_ACCESSORS]
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=float, default=2,
+                        help='Days of history each stream syncs')
+    parser.add_argument('--streams', nargs='+', default=streams,
+                        choices=streams)
+    parser.add_argument('--settings', default='{}',
+                        help='JSON object of extra tap settings')
+    add_options(parser)
+    args = parser.parse_args()
+
+    server = MockServer(0, options_from_args(args)).start()
+
+    start = datetime.now(timezone.utc) - timedelta(days=args.days)
+
+    settings = {
+        'token': 'benchmark',
+        'wsdl_url': server.wsdl_url,
+        'default_start_date': start.strftime('%Y-%m-%dT%H:%M:%S+00:00'),
+    }
+    settings.update(json.loads(args.settings))
+
+    results = {}
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for stream_accessor in AVAILABLE_STREAM_ACCESSORS:
+                if stream_accessor.TABLE not in args.streams:
+                    continue
+
+                results[stream_accessor.TABLE] = run_stream(
+                    server, directory, catalog_entry(stream_accessor),
+                    settings)
+    finally:
+        server.stop()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Compares asdict + flatten + get_field_selector with the compiled
+transformer.
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+import suds.sudsobject
+
+from benchmarks.pages import activity_page, contact_page, selected
+from tap_bronto.schemas import get_field_selector, get_transformer, \
+    ACTIVITY_SCHEMA, CONTACT_SCHEMA
+
+
+def flatten(item):
+    read_only_data = suds.sudsobject.asdict(
+        item.pop('readOnlyContactData'))
+    return {**item, **read_only_data}
+
+
+def asdict_contacts(schema):
+    select = get_field_selector(schema)
+
+    return lambda page: [select(flatten(suds.sudsobject.asdict(result)))
+                         for result in page]
+
+
+def asdict_activities(schema):
+    select = get_field_selector(schema)
+
+    return lambda page: [select(suds.sudsobject.asdict(result))
+                         for result in page]
+
+
+def compiled(schema, flatten=()):
+    transform = get_transformer(schema, flatten=flatten)
+
+    return lambda page: [transform(result) for result in page]
+
+
+def measure(run, page, repeat):
+    timings = []
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run(page)
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    run(page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'records_per_second': round(len(page) / min(timings)),
+        'peak_kib_per_page': round(peak / 1024),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    contacts = selected(CONTACT_SCHEMA)
+    activities = selected(ACTIVITY_SCHEMA)
+
+    contact_results = contact_page()
+    activity_results = activity_page()
+
+    print(json.dumps({
+        'contact': {
+            'asdict': measure(asdict_contacts(contacts),
+                              contact_results, args.repeat),
+            'compiled': measure(compiled(contacts,
+                                         ['readOnlyContactData']),
+                                contact_results, args.repeat),
+        },
+        'activity': {
+            'asdict': measure(asdict_activities(activities),
+                              activity_results, args.repeat),
+            'compiled': measure(compiled(activities),
+                                activity_results, args.repeat),
+        },
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Times transforming raw activity pages in-process and on worker
+processes.
+"""
+import argparse
+import json
+import time
+
+from benchmarks.pages import activity_page, reply, selected
+from tap_bronto.client import CLIENT_POOL
+from tap_bronto.ids import ActivityIds
+from tap_bronto.schemas import ACTIVITY_SCHEMA
+from tap_bronto.streaming import RawPage, row_parser
+from tap_bronto.workers import PageJob, WorkerPool, encode_page
+
+
+OPERATION = 'readRecentOutboundActivities'
+
+
+def in_process(job, pages):
+    for page in pages:
+        encode_page(job, OPERATION, page.body)
+
+
+def with_workers(pool, job, pages):
+    for _ in pool.map_pages(job, pages):
+        pass
+
+
+def records_per_second(function, records):
+    started = time.perf_counter()
+    function()
+
+    return round(records / (time.perf_counter() - started))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--wsdl', required=True)
+    parser.add_argument('--pages', type=int, default=16)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    config = {'wsdl_url': args.wsdl}
+    CLIENT_POOL.configure(config)
+
+    body = reply(OPERATION, activity_page())
+    pages = [RawPage(body, row_parser(CLIENT_POOL.base(), OPERATION))
+             for _ in range(args.pages)]
+    records = len(pages) * len(pages[0])
+
+    job = PageJob('outbound_activity', selected(ACTIVITY_SCHEMA),
+                  finish=ActivityIds())
+
+    results = {
+        'in_process': records_per_second(
+            lambda: in_process(job, pages), records),
+    }
+
+    for workers in args.workers:
+        pool = WorkerPool()
+        pool.start(workers, config)
+
+        try:
+            # Let every worker build its client and compile the job.
+            with_workers(pool, job, pages[:workers * 2])
+
+            results['workers_{}'.format(workers)] = records_per_second(
+                lambda: with_workers(pool, job, pages), records)
+        finally:
+            pool.shutdown()
+
+    print(json.dumps({'records_per_second': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
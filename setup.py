@@ -16,9 +16,13 @@ setup(
         'funcy==1.10',
         'voluptuous==0.10.5',
     ],
+    extras_require={
+        'test': ['pytest'],
+    },
     entry_points='''
     [console_scripts]
     tap-bronto=tap_bronto:main
+    tap-bronto-merge-state=tap_bronto.shards:main
     ''',
     packages=['tap_bronto']
 )
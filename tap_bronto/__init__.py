@@ -1,4 +1,5 @@
 import argparse
+import concurrent.futures
 import json
 import singer
 
@@ -8,8 +9,14 @@ from tap_bronto.endpoints.unsubscribe import UnsubscribeStream
 from tap_bronto.endpoints.outbound_activity import OutboundActivityStream
 from tap_bronto.endpoints.inbound_activity import InboundActivityStream
 
+from tap_bronto.client import CLIENT_POOL
+from tap_bronto.output import Writer, ThreadedWriter
+from tap_bronto.profiling import StreamProfiler
 from tap_bronto.schemas import is_selected
-from tap_bronto.state import load_state, save_state
+from tap_bronto.session import SESSIONS
+from tap_bronto.shards import parse_shard
+from tap_bronto.state import load_state, StateManager
+from tap_bronto.workers import WORKERS
 
 LOGGER = singer.get_logger()  # noqa
 
@@ -57,6 +64,38 @@ def load_config(filename):
     return config
 
 
+def configure(config, args):
+    if getattr(args, 'wsdl_cache', None) is not None:
+        config['wsdl_cache'] = args.wsdl_cache
+
+    if getattr(args, 'workers', None) is not None:
+        config['workers'] = args.workers
+
+    if getattr(args, 'profile', None) is not None:
+        config['profile'] = args.profile
+
+    for option, key in [('shard', 'shard'),
+                        ('start', 'sync_start'),
+                        ('end', 'sync_end')]:
+        if getattr(args, option, None) is not None:
+            config[key] = getattr(args, option)
+
+    if getattr(args, 'record', None) is not None:
+        config['cassette'] = args.record
+        config['cassette_mode'] = 'record'
+
+    if getattr(args, 'replay', None) is not None:
+        config['cassette'] = args.replay
+        config['cassette_mode'] = 'replay'
+
+    if config.get('shard'):
+        parse_shard(config['shard'])
+
+    CLIENT_POOL.configure(config)
+    SESSIONS.max_age = float(config.get('session_max_age',
+                                        SESSIONS.max_age))
+
+
 def load_catalog(filename):
     catalog = {}
 
@@ -87,6 +126,33 @@ def _is_selected(catalog_entry):
              catalog_entry.get('selected', default) is True))
 
 
+def sync_stream(stream_accessor):
+    profiler = None
+
+    if stream_accessor.config.get('profile'):
+        profiler = StreamProfiler.from_config(stream_accessor.config,
+                                              stream_accessor.TABLE)
+
+    try:
+        stream_accessor.metrics.start()
+
+        if profiler is not None:
+            profiler.start()
+
+        try:
+            stream_accessor.sync()
+        finally:
+            if profiler is not None:
+                profiler.stop(stream_accessor.metrics.counts['records'])
+
+    except Exception as exception:
+        LOGGER.error(exception)
+        LOGGER.error('Failed to sync endpoint, moving on!')
+
+    finally:
+        stream_accessor.close()
+
+
 def do_sync(args):
     LOGGER.info("Starting sync.")
 
@@ -94,6 +160,19 @@ def do_sync(args):
     state = load_state(args.state)
     catalog = load_catalog(args.properties)
 
+    configure(config, args)
+
+    max_parallel_streams = int(config.get('max_parallel_streams', 1))
+
+    WORKERS.start(int(config.get('workers', 0)), config)
+
+    if max_parallel_streams > 1:
+        writer = ThreadedWriter.from_config(config)
+    else:
+        writer = Writer.from_config(config)
+
+    state_manager = StateManager.from_config(config, state)
+
     stream_accessors = []
 
     for stream_catalog in catalog.get('streams'):
@@ -107,21 +186,34 @@ def do_sync(args):
         for available_stream_accessor in AVAILABLE_STREAM_ACCESSORS:
             if available_stream_accessor.matches_catalog(stream_catalog):
                 stream_accessors.append(available_stream_accessor(
-                    config, state, stream_catalog))
+                    config, state_manager.snapshot(), stream_catalog,
+                    writer=writer, state_manager=state_manager))
 
                 break
 
-    for stream_accessor in stream_accessors:
-        try:
-            stream_accessor.state = state
-            stream_accessor.sync()
-            state = stream_accessor.state
+    try:
+        if max_parallel_streams > 1:
+            LOGGER.info('Syncing up to {} streams in parallel.'
+                        .format(max_parallel_streams))
 
-        except Exception as exception:
-            LOGGER.error(exception)
-            LOGGER.error('Failed to sync endpoint, moving on!')
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=max_parallel_streams) as executor:
+                list(executor.map(sync_stream, stream_accessors))
+
+        else:
+            for stream_accessor in stream_accessors:
+                sync_stream(stream_accessor)
 
-    save_state(state)
+        LOGGER.info('SOAP client stats: {}'.format(CLIENT_POOL.stats()))
+        LOGGER.info('Session stats: {}'.format(SESSIONS.stats()))
+        LOGGER.info('State stats: {}'.format(state_manager.stats()))
+
+        state_manager.save(writer)
+
+    finally:
+        writer.close()
+        WORKERS.shutdown()
+        CLIENT_POOL.close()
 
 
 def do_discover(args):
@@ -131,6 +223,8 @@ def do_discover(args):
 
     config = load_config(args.config)
 
+    configure(config, args)
+
     for available_stream_accessor in AVAILABLE_STREAM_ACCESSORS:
         stream_accessor = available_stream_accessor(config)
 
@@ -159,6 +253,38 @@ def main():
         help=('When "--discover" is set, this flag selects all '
               'fields for replication in the generated catalog'),
         action='store_true')
+    parser.add_argument(
+        '--wsdl-cache',
+        help=('Directory to cache the parsed Bronto WSDL in, so later '
+              'runs start without fetching or parsing it'))
+    parser.add_argument(
+        '--workers', type=int,
+        help=('Number of worker processes to transform and encode '
+              'contact and activity pages on'))
+    parser.add_argument(
+        '--profile', metavar='DIR',
+        help=('Profile each stream\'s sync and write a cProfile dump and '
+              'sampled stacks for flame graphs to this directory'))
+    parser.add_argument(
+        '--shard',
+        help=('Only sync the INDEX/COUNT share (e.g. 0/4) of the whole '
+              'days each stream would sync, for spreading a backfill '
+              'over several runs'))
+    parser.add_argument(
+        '--start',
+        help='Sync from this date instead of the bookmark or start date')
+    parser.add_argument(
+        '--end',
+        help='Stop syncing at this date instead of now')
+
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument(
+        '--record', metavar='CASSETTE',
+        help='Record every reply from Bronto to this gzipped file')
+    cassette.add_argument(
+        '--replay', metavar='CASSETTE',
+        help=('Answer requests with the replies recorded in this file '
+              'instead of calling Bronto'))
 
     args = parser.parse_args()
 
@@ -0,0 +1,40 @@
+import singer
+
+LOGGER = singer.get_logger()  # noqa
+
+
+class DuplicateAudit:
+    """
+    Counts how many records a stream emitted against how many distinct
+    primary keys they had. Only hashes of the keys are kept, but that is
+    still one set entry per distinct record, so this is opt-in through
+    the `audit_duplicates` config key.
+    """
+
+    def __init__(self, table, key_properties):
+        self.table = table
+        self.key_properties = key_properties
+        self.records = 0
+        self.keys = set()
+
+    def observe(self, records):
+        for record in records:
+            self.keys.add(hash(tuple(record.get(key)
+                                     for key in self.key_properties)))
+
+        self.records += len(records)
+
+    def observe_keys(self, keys, count):
+        for key in keys:
+            self.keys.add(hash(key))
+
+        self.records += count
+
+    def log(self):
+        unique = len(self.keys)
+        ratio = self.records / unique if unique else 0.0
+
+        LOGGER.info('{}: emitted {} records for {} unique keys '
+                    '({} duplicate emissions, {:.2f} records per key)'
+                    .format(self.table, self.records, unique,
+                            self.records - unique, ratio))
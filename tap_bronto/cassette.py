@@ -0,0 +1,221 @@
+import base64
+import collections
+import gzip
+import hashlib
+import io
+import json
+import re
+import threading
+
+from xml.etree.ElementTree import canonicalize
+
+import singer
+
+from suds.transport import Reply, Transport, TransportError
+
+LOGGER = singer.get_logger()  # noqa
+
+
+MODES = ('record', 'replay')
+
+# Values that change from run to run, or are secret, and are left out
+# of the key a request is matched by.
+VOLATILE = re.compile(
+    rb'(<(?:[\w.-]+:)?(?:sessionId|apiToken)(?:\s[^>]*)?>)[^<]*'
+    rb'(</(?:[\w.-]+:)?(?:sessionId|apiToken)>)')
+
+LOGIN = re.compile(rb'<(?:[\w.-]+:)?login[\s>/]')
+
+
+def request_key(method, url, body):
+    """
+    suds numbers namespace prefixes in no fixed order from one run to
+    the next, so envelopes are canonicalized before they're digested.
+    """
+    digest = hashlib.sha256()
+    digest.update('{} {}\n'.format(method, url).encode('utf-8'))
+
+    if body is not None:
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+
+        body = canonicalize(body, rewrite_prefixes=True).encode('utf-8')
+        digest.update(VOLATILE.sub(rb'\1\2', body))
+
+    return digest.hexdigest()
+
+
+class Cassette:
+    """
+    A gzipped file of the replies to every HTTP request a run sent, one
+    JSON line each, keyed by a digest of the request. Requests are only
+    stored as that digest, with session ids and the API token left out,
+    so a recording holds no credentials and replays under any session.
+
+    Identical requests, like the NEXT pages of an activity cursor, are
+    replayed in the order they were recorded. Requests that depend on
+    the current time only match when the replay covers the same range,
+    so record and replay with the same `--start` and `--end`.
+    """
+
+    def __init__(self, path, mode):
+        if mode not in MODES:
+            raise RuntimeError('Unknown cassette_mode {}, expected '
+                               '"record" or "replay".'.format(mode))
+
+        self.path = path
+        self.mode = mode
+        self.recorded = 0
+        self.replayed = 0
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._replies = None
+
+    def record(self, key, status, headers, body):
+        line = json.dumps({
+            'key': key,
+            'status': status,
+            'headers': headers,
+            'body': base64.b64encode(body).decode('ascii'),
+        })
+
+        with self._lock:
+            if self._file is None:
+                self._file = gzip.open(self.path, 'wt', encoding='utf-8')
+
+            self._file.write(line + '\n')
+            self.recorded += 1
+
+    def load(self):
+        replies = collections.defaultdict(collections.deque)
+
+        with gzip.open(self.path, 'rt', encoding='utf-8') as handle:
+            for line in handle:
+                entry = json.loads(line)
+                entry['body'] = base64.b64decode(entry['body'])
+                replies[entry['key']].append(entry)
+
+        LOGGER.info('Loaded {} recorded replies from {}'.format(
+            sum(len(entries) for entries in replies.values()), self.path))
+
+        return replies
+
+    def replay(self, method, key, reusable=False):
+        with self._lock:
+            if self._replies is None:
+                self._replies = self.load()
+
+            entries = self._replies.get(key)
+
+            if not entries:
+                raise RuntimeError(
+                    'No recorded reply left for a {} request in {}. Replay '
+                    'with the settings, catalog, --start and --end the '
+                    'cassette was recorded with.'.format(method, self.path))
+
+            # How often the WSDL is downloaded and how often threads log
+            # in depends on timing, so the last of those replies is kept
+            # for reuse.
+            if reusable and len(entries) == 1:
+                entry = entries[0]
+            else:
+                entry = entries.popleft()
+
+            self.replayed += 1
+
+            return entry
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self):
+        return {
+            'cassette_recorded': self.recorded,
+            'cassette_replayed': self.replayed,
+        }
+
+
+class RecordingTransport(Transport):
+    """
+    Sends requests through another transport and records every reply,
+    faults included, to a Cassette.
+    """
+
+    def __init__(self, transport, cassette):
+        super().__init__()
+        self.transport = transport
+        self.cassette = cassette
+
+    def open(self, request):
+        key = request_key('GET', request.url, None)
+
+        try:
+            body = self.transport.open(request).read()
+        except TransportError as error:
+            raise self.record_error(key, error)
+
+        self.cassette.record(key, 200, {}, body)
+
+        return io.BytesIO(body)
+
+    def send(self, request):
+        key = request_key('POST', request.url, request.message)
+
+        try:
+            reply = self.transport.send(request)
+        except TransportError as error:
+            raise self.record_error(key, error)
+
+        self.cassette.record(key, reply.code, dict(reply.headers),
+                             reply.message)
+
+        return reply
+
+    def record_error(self, key, error):
+        body = error.fp.read() if error.fp is not None else b''
+        self.cassette.record(key, error.httpcode, {}, body)
+
+        return TransportError(error.args[0], error.httpcode,
+                              io.BytesIO(body))
+
+
+class ReplayTransport(Transport):
+    """
+    Answers requests with the replies recorded in a Cassette, without
+    touching the network.
+    """
+
+    def __init__(self, cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def open(self, request):
+        entry = self.cassette.replay(
+            'GET', request_key('GET', request.url, None), reusable=True)
+
+        self.raise_for_status(entry)
+
+        return io.BytesIO(entry['body'])
+
+    def send(self, request):
+        message = request.message
+
+        if isinstance(message, str):
+            message = message.encode('utf-8')
+
+        entry = self.cassette.replay(
+            'POST', request_key('POST', request.url, message),
+            reusable=LOGIN.search(message) is not None)
+
+        self.raise_for_status(entry)
+
+        return Reply(entry['status'], entry['headers'], entry['body'])
+
+    def raise_for_status(self, entry):
+        if entry['status'] >= 300:
+            raise TransportError('Recorded error', entry['status'],
+                                 io.BytesIO(entry['body']))
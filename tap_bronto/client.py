@@ -0,0 +1,270 @@
+import copy
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+import singer
+import suds
+import suds.cache
+import suds.client
+
+from suds.bindings.multiref import MultiRef
+from suds.options import Options
+from suds.transport.https import HttpAuthenticated
+
+from tap_bronto.cassette import Cassette, RecordingTransport, \
+    ReplayTransport
+from tap_bronto.session import SessionHeaderPlugin
+from tap_bronto.transport import ConnectionPool, PooledTransport, \
+    DEFAULT_POOL_SIZE
+
+LOGGER = singer.get_logger()  # noqa
+
+
+BRONTO_WSDL = 'https://api.bronto.com/v4?wsdl'
+
+DEFAULT_WSDL_CACHE_DAYS = 7
+
+CLONED_OPTIONS = ['cache', 'cachingpolicy', 'faults', 'location',
+                  'prefixes', 'prettyxml', 'retxml', 'xstq']
+
+
+class WsdlCache(suds.cache.ObjectCache):
+    """
+    suds-py3's ObjectCache reads pickles back in text mode and mangles
+    its expiry duration, so every lookup misses. This reads the pickled
+    definitions as bytes and does its own age check.
+    """
+
+    def __init__(self, location, days=DEFAULT_WSDL_CACHE_DAYS):
+        super().__init__(location=location)
+        self.days = days
+
+    def path(self, id):
+        return os.path.join(self.location, '{}-{}.{}'.format(
+            self.fnprefix, id, self.fnsuffix()))
+
+    def get(self, id):
+        path = self.path(id)
+
+        try:
+            age = time.time() - os.path.getmtime(path)
+        except OSError:
+            return None
+
+        if self.days and age > self.days * 24 * 60 * 60:
+            LOGGER.info('Cached WSDL is older than {} days, refreshing.'
+                        .format(self.days))
+            self.purge(id)
+            return None
+
+        try:
+            with open(path, 'rb') as handle:
+                return pickle.load(handle)
+
+        except Exception:
+            self.purge(id)
+
+
+class LocalMultiRef(threading.local):
+    """
+    suds keeps one MultiRef per binding, which every clone shares, and
+    resets its state on each reply it unmarshals. Threads unmarshalling
+    replies at the same time clobber each other's state and fail with
+    TypeNotFound, so each thread gets its own.
+    """
+
+    def __init__(self):
+        self.multiref = MultiRef()
+
+    def process(self, body):
+        return self.multiref.process(body)
+
+
+def wsdl_cache(location, wsdl, days=DEFAULT_WSDL_CACHE_DAYS):
+    """
+    Returns a cache for the parsed WSDL definitions. Entries live in a
+    subdirectory keyed by the WSDL url and the suds version, so a pickled
+    snapshot is never loaded by a different suds release or for a
+    different endpoint.
+    """
+    key = hashlib.sha1('{}|{}'.format(wsdl, suds.__version__)
+                       .encode('utf-8')).hexdigest()[:16]
+
+    return WsdlCache(
+        location=os.path.join(os.path.expanduser(location), key),
+        days=days)
+
+
+class ClientPool:
+    """
+    Parses the Bronto WSDL once per process and hands out cheap clones
+    of the resulting suds client. Clones share the parsed WSDL and type
+    factory, but each has its own options (and so its own soap headers),
+    so every thread gets a clone of its own.
+    """
+
+    def __init__(self, wsdl=BRONTO_WSDL, timeout=3600):
+        self.wsdl = wsdl
+        self.timeout = timeout
+        self.cache_dir = None
+        self.cache_days = DEFAULT_WSDL_CACHE_DAYS
+        self.http_transport = 'pooled'
+        self.http_pool_size = DEFAULT_POOL_SIZE
+        self.http_gzip = True
+        self.cassette = None
+
+        self.built = 0
+        self.build_seconds = 0.0
+        self.clones = 0
+
+        self._base = None
+        self._connections = None
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    def configure(self, config):
+        if self._base is not None:
+            raise RuntimeError('SOAP client already built, configure '
+                               'the pool before the first login.')
+
+        self.wsdl = config.get('wsdl_url', self.wsdl)
+        self.cache_dir = config.get('wsdl_cache', self.cache_dir)
+        self.cache_days = config.get('wsdl_cache_days', self.cache_days)
+        self.http_transport = config.get('http_transport',
+                                         self.http_transport)
+        self.http_pool_size = int(config.get('http_pool_size',
+                                             self.http_pool_size))
+        self.timeout = float(config.get('http_timeout', self.timeout))
+        self.http_gzip = config.get('http_gzip', self.http_gzip)
+
+        if self.http_transport not in ('pooled', 'suds'):
+            raise RuntimeError('Unknown http_transport {}, expected '
+                               '"pooled" or "suds".'
+                               .format(self.http_transport))
+
+        if config.get('cassette'):
+            self.cassette = Cassette(config['cassette'],
+                                     config.get('cassette_mode', 'replay'))
+
+    def base(self):
+        if self._base is None:
+            with self._lock:
+                if self._base is None:
+                    self._base = self._build()
+
+        return self._base
+
+    def _build(self):
+        LOGGER.info('Building SOAP client from {}'.format(self.wsdl))
+
+        options = {'timeout': self.timeout,
+                   'transport': self.transport()}
+
+        if self.cache_dir is not None:
+            # cachingpolicy=1 pickles the fully parsed definitions rather
+            # than the raw XML document, so a warm start skips both the
+            # download and the schema parse.
+            options['cache'] = wsdl_cache(
+                self.cache_dir, self.wsdl, self.cache_days)
+            options['cachingpolicy'] = 1
+
+        started = time.monotonic()
+        client = suds.client.Client(self.wsdl, **options)
+        elapsed = time.monotonic() - started
+
+        for port in client.wsdl.services[0].ports:
+            for method in port.methods.values():
+                for binding in (method.binding.input, method.binding.output):
+                    if not isinstance(binding.multiref, LocalMultiRef):
+                        binding.multiref = LocalMultiRef()
+
+        self.built += 1
+        self.build_seconds += elapsed
+
+        LOGGER.info('Built SOAP client in {:.2f}s'.format(elapsed))
+
+        return client
+
+    def transport(self):
+        """
+        Pooled transports all draw on one set of kept-alive connections.
+        suds's own transport opens a new connection per request. With a
+        cassette, replies are recorded from either, or replayed instead.
+        """
+        if self.cassette is not None and self.cassette.mode == 'replay':
+            return ReplayTransport(self.cassette)
+
+        if self.http_transport == 'suds':
+            transport = HttpAuthenticated(timeout=self.timeout)
+        else:
+            with self._lock:
+                if self._connections is None:
+                    self._connections = ConnectionPool(
+                        self.http_pool_size, self.timeout)
+
+            transport = PooledTransport(self._connections,
+                                        gzip=self.http_gzip)
+
+        if self.cassette is not None:
+            return RecordingTransport(transport, self.cassette)
+
+        return transport
+
+    def clone(self):
+        """
+        Client.clone() in suds-py3 deep copies the options and recurses
+        forever, so copy the client by hand instead. The clone shares the
+        parsed WSDL and factory with the base client, and gets its own
+        options, transport and session header.
+        """
+        base = self.base()
+
+        clone = copy.copy(base)
+        clone.options = Options()
+        clone.set_options(
+            transport=self.transport(),
+            plugins=[SessionHeaderPlugin(base.wsdl.tns)],
+            **{name: getattr(base.options, name)
+               for name in CLONED_OPTIONS})
+        clone.service = suds.client.ServiceSelector(
+            clone, base.wsdl.services)
+        clone.messages = dict(tx=None, rx=None)
+
+        return clone
+
+    def client(self):
+        client = getattr(self._local, 'client', None)
+
+        if client is None:
+            client = self.clone()
+            self._local.client = client
+
+            with self._lock:
+                self.clones += 1
+
+        return client
+
+    def stats(self):
+        stats = {
+            'clients_built': self.built,
+            'client_build_seconds': round(self.build_seconds, 3),
+            'client_clones': self.clones,
+        }
+
+        if self._connections is not None:
+            stats.update(self._connections.stats())
+
+        if self.cassette is not None:
+            stats.update(self.cassette.stats())
+
+        return stats
+
+    def close(self):
+        if self.cassette is not None:
+            self.cassette.close()
+
+
+CLIENT_POOL = ClientPool()
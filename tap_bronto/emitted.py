@@ -0,0 +1,153 @@
+import array
+import bisect
+import hashlib
+import os
+
+from datetime import date, datetime, timedelta, timezone
+
+import singer
+
+LOGGER = singer.get_logger()  # noqa
+
+
+# Bronto only serves the last 30 days of activity, so nothing older can
+# come back in a rewind.
+DEFAULT_HORIZON_DAYS = 30
+
+SUFFIX = '.idx'
+
+
+def fingerprint(line):
+    """
+    64-bit fingerprint of an encoded RECORD line. It covers every
+    emitted field, so a record whose content changed gets a new one.
+    """
+    return int.from_bytes(
+        hashlib.blake2b(line, digest_size=8).digest(), 'little')
+
+
+def index_day(value):
+    if isinstance(value, str) and len(value) >= 10:
+        return value[:10]
+
+    return 'undated'
+
+
+class EmittedIndex:
+    """
+    Remembers the fingerprints of the records a stream emitted, in one
+    compact file of sorted 64-bit fingerprints per day of `field`, and
+    drops records it has already emitted unchanged. Days older than
+    `horizon_days` are deleted when the index is saved.
+
+    A record only counts as emitted once the tap has written it, not
+    once the target has loaded it. If a target fails after the tap
+    finishes, clear the index so the next rewind emits everything again.
+    """
+
+    def __init__(self, directory, table, horizon_days=DEFAULT_HORIZON_DAYS):
+        self.directory = os.path.join(os.path.expanduser(directory), table)
+        self.table = table
+        self.horizon_days = horizon_days
+
+        self.hits = 0
+        self.misses = 0
+
+        self.saved = {}
+        self.added = {}
+
+    def path(self, day):
+        return os.path.join(self.directory, day + SUFFIX)
+
+    def load(self, day):
+        fingerprints = array.array('Q')
+
+        try:
+            with open(self.path(day), 'rb') as handle:
+                fingerprints.frombytes(handle.read())
+        except FileNotFoundError:
+            pass
+
+        self.saved[day] = fingerprints
+        self.added[day] = set()
+
+    def seen(self, day, value):
+        if day not in self.saved:
+            self.load(day)
+
+        saved = self.saved[day]
+        position = bisect.bisect_left(saved, value)
+
+        if position < len(saved) and saved[position] == value:
+            return True
+
+        added = self.added[day]
+
+        if value in added:
+            return True
+
+        added.add(value)
+
+        return False
+
+    def filter(self, page):
+        """
+        Returns the EncodedPage `page` without the records that were
+        already emitted unchanged.
+        """
+        keep = []
+
+        for position, (day, value) in enumerate(page.index_keys):
+            if self.seen(day, value):
+                self.hits += 1
+            else:
+                self.misses += 1
+                keep.append(position)
+
+        if len(keep) == len(page.lines):
+            return page
+
+        return page.select(keep)
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+
+        for day, added in self.added.items():
+            if not added:
+                continue
+
+            merged = array.array('Q', sorted(
+                set(self.saved[day]).union(added)))
+
+            temporary = self.path(day) + '.tmp'
+
+            with open(temporary, 'wb') as handle:
+                merged.tofile(handle)
+
+            os.replace(temporary, self.path(day))
+
+            self.saved[day] = merged
+            self.added[day] = set()
+
+        self.trim()
+
+    def trim(self):
+        today = datetime.now(timezone.utc).date()
+        oldest = today - timedelta(days=self.horizon_days)
+
+        for name in os.listdir(self.directory):
+            if not name.endswith(SUFFIX):
+                continue
+
+            try:
+                day = date.fromisoformat(name[:-len(SUFFIX)])
+            except ValueError:
+                continue
+
+            if day < oldest:
+                os.remove(os.path.join(self.directory, name))
+
+    def log(self):
+        LOGGER.info('{}: emitted index skipped {} records that were '
+                    'already emitted unchanged, {} were new or changed'
+                    .format(self.table, self.hits, self.misses))
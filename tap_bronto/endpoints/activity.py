@@ -0,0 +1,418 @@
+from tap_bronto.envelope import Variable
+from tap_bronto.ids import ActivityIds
+from tap_bronto.pipeline import interleave
+from tap_bronto.schemas import get_transformer, ACTIVITY_SCHEMA
+from tap_bronto.session import fault_code, SessionExpired
+from tap_bronto.stream import Stream
+from tap_bronto.streaming import RawPage
+from tap_bronto.transport import ReplyLost
+from tap_bronto.workers import PageJob
+
+from datetime import datetime, timedelta
+
+import collections
+import concurrent.futures
+import pytz
+import singer
+import suds
+import threading
+
+LOGGER = singer.get_logger()  # noqa
+
+
+# Bronto's fault for a search cursor that has no more results.
+END_OF_RESULTS = 116
+
+
+def cover_partitions(partitions, known_types=None):
+    """
+    Adds a partition for the activity types none of `partitions` lists,
+    so every type gets read. With the `known_types` a search accepts,
+    it lists the missing ones, if any. Without them, it is None: a
+    cursor over every type, which drops the types the others read.
+    """
+    if known_types is None:
+        return partitions + [None]
+
+    listed = set(type_ for types in partitions for type_ in types)
+    missing = [type_ for type_ in known_types if type_ not in listed]
+
+    if missing:
+        return partitions + [missing]
+
+    return partitions
+
+
+class ActivityStream(Stream):
+    """
+    Shared by the inbound and outbound activity streams, which only
+    differ in the search request type and the operation they call.
+    """
+
+    KEY_PROPERTIES = ['id']
+    WINDOW = timedelta(hours=1)
+    MIN_WINDOW = timedelta(minutes=15)
+    MAX_WINDOW = timedelta(hours=24)
+    SCHEMA = ACTIVITY_SCHEMA
+    INDEX_FIELD = 'createdDate'
+    BOOKMARK_FIELD = 'createdDate'
+
+    DIRECTION = None
+    SEARCH_REQUEST = None
+    OPERATION = None
+
+    ids = None
+    partitioner = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.partitions = self.get_partitions()
+        self.partition_stats = [{'records': 0, 'pages': 0}
+                                for _ in self.partitions]
+        self.partition_pages = {}
+        self._stats_lock = threading.Lock()
+
+    def get_partitions(self):
+        """
+        Returns the activity types each concurrent cursor reads, from the
+        `activity_partitions` setting for this stream, or one cursor over
+        every type by default.
+        """
+        partitions = self.config.get('activity_partitions', {}) \
+                                .get(self.TABLE)
+
+        if not partitions:
+            return [None]
+
+        partitions = [[types] if isinstance(types, str) else list(types)
+                      for types in partitions]
+        covered = cover_partitions(partitions, self.activity_types())
+
+        if covered[-1] is None:
+            LOGGER.warn('{}: the WSDL doesn\'t list the activity types, '
+                        'so types activity_partitions leaves out are read '
+                        'through one more partition over every type.'
+                        .format(self.TABLE))
+
+        elif len(covered) > len(partitions):
+            LOGGER.warn('{}: activity_partitions leaves out {}, reading '
+                        'them through one more partition.'.format(
+                            self.TABLE, '+'.join(covered[-1])))
+
+        return covered
+
+    def activity_types(self):
+        """
+        Returns the activity types the WSDL allows in a search, or None
+        if it doesn't enumerate them.
+        """
+        request = self.client.factory.resolver.find(self.SEARCH_REQUEST)
+
+        for child, _ in request.children():
+            if child.name == 'types' and child.resolve().enum():
+                return [value.name for value, _
+                        in child.resolve().children()]
+
+        return None
+
+    def skipped_types(self, position):
+        """
+        The types a catch-all partition drops, since other partitions
+        read them.
+        """
+        if self.partitions[position] is not None or \
+                len(self.partitions) == 1:
+            return None
+
+        return set(type_ for types in self.partitions if types is not None
+                   for type_ in types)
+
+    def partition_name(self, position):
+        types = self.partitions[position]
+
+        if types is None:
+            return 'all types' if len(self.partitions) == 1 \
+                else 'other types'
+
+        return '+'.join(types)
+
+    def make_filter(self, start, end, types=None):
+        _filter = self.client.factory.create(self.SEARCH_REQUEST)
+        _filter.start = start
+        _filter.end = end
+        _filter.size = 5000
+        _filter.readDirection = 'FIRST'
+
+        if types is not None:
+            _filter.types = types
+
+        return _filter
+
+    def get_start_date(self, table):
+        start = super().get_start_date(table)
+
+        earliest_available = datetime.now(pytz.utc) - timedelta(days=30)
+
+        if earliest_available > start:
+            LOGGER.warn('Start date before 30 days ago, but Bronto '
+                        'only returns the past 30 days of activity. '
+                        'Using a start date of -30 days.')
+            return earliest_available
+        else:
+            LOGGER.info('Rewinding three days, since activities can change...')
+
+        return start - timedelta(days=3)
+
+    def sync(self):
+        table = self.TABLE
+
+        self.write_schema()
+
+        self.transform = get_transformer(self.catalog.get('schema'))
+        self.ids = ActivityIds(
+            self.config.get('activity_id_digest', 'md5'),
+            audit=bool(self.config.get('audit_duplicates')))
+
+        start = self.get_start_date(table)
+
+        LOGGER.info('Syncing {} activities.'.format(self.DIRECTION))
+
+        self.login()
+
+        if self.config.get('activity_cursor'):
+            self.sync_cursor(start)
+        else:
+            self.sync_windows(start, self.BOOKMARK_FIELD)
+
+        LOGGER.info('Done syncing {} activities.'.format(self.DIRECTION))
+
+    def sync_cursor(self, start):
+        """
+        Reads everything from `start` until now through one search
+        request per partition, paging with readDirection NEXT until
+        Bronto runs out of results. Activities come back in createdDate
+        order, so after each page the bookmark moves to the createdDate
+        of the last record every partition still reading has written,
+        and to the end of the range once they are all done. The number
+        of requests follows the number of activities rather than the
+        number of hours in the range.
+        """
+        start = self.sync_range(start, self.BOOKMARK_FIELD)
+        end = self.range_end()
+
+        positions = collections.deque()
+        progress = [None for _ in self.partitions]
+        done = set()
+
+        def read():
+            # A partition is only marked done along with the next page
+            # of another one, so every page it read is written by then.
+            finished = []
+
+            for position, page in self.read_partitions(start, end,
+                                                       finished=True):
+                if page is None:
+                    finished.append(position)
+                    continue
+
+                positions.append((position, finished))
+                finished = []
+                yield page
+
+        for page in self.transform_pages(self.prefetch(read())):
+            position, finished = positions.popleft()
+            last_value = self.last_value(page)
+
+            done.update(finished)
+            self.write_page(page)
+
+            if last_value is not None:
+                progress[position] = last_value
+
+            reading = [value for other, value in enumerate(progress)
+                       if other not in done]
+
+            if reading and None not in reading:
+                self.save_bookmark(self.BOOKMARK_FIELD, min(reading))
+
+        # Every partition has read up to `end`, whether it had rows or
+        # not.
+        self.save_bookmark(self.BOOKMARK_FIELD, end)
+
+    def read_window(self, start, end):
+        pages = collections.Counter()
+
+        for position, page in self.read_partitions(start, end):
+            if page:
+                pages[position] += 1
+
+            yield page
+
+        with self._stats_lock:
+            self.partition_pages[(start, end)] = max(pages.values(),
+                                                     default=0)
+
+    def window_pages(self, window, pages):
+        """
+        Partitions read a window side by side, so it's only as crowded
+        as the partition that needed the most pages.
+        """
+        with self._stats_lock:
+            return self.partition_pages.pop(tuple(window), pages)
+
+    def read_partitions(self, start, end, finished=False):
+        """
+        Reads `start` to `end` with one cursor per partition, yielding
+        `(position, page)` pairs. With several partitions, their cursors
+        run concurrently and pages are yielded as they arrive. With
+        `finished`, `(position, None)` follows a partition's last page.
+        """
+        def read_cursor(position):
+            yield from self.read_cursor(start, end, position)
+
+            if finished:
+                yield None
+
+        if len(self.partitions) == 1:
+            for page in read_cursor(0):
+                yield 0, page
+
+            return
+
+        if self.partitioner is None:
+            # Long-lived threads, so each partition's cursor keeps its
+            # client and session from one window to the next.
+            self.partitioner = concurrent.futures.ThreadPoolExecutor(
+                max_workers=int(self.config.get(
+                    'max_parallel_partitions', len(self.partitions))),
+                thread_name_prefix='{}-partition'.format(self.TABLE))
+
+        yield from interleave(
+            [read_cursor(position)
+             for position in range(len(self.partitions))],
+            int(self.config.get('prefetch_pages', 2)),
+            self.partitioner)
+
+    def read_cursor(self, start, end, position):
+        """
+        Pages through one search request. Bronto keeps the cursor with
+        the session that read the FIRST page, so that session's age is
+        only checked before it, and every NEXT page is pinned to it; a
+        116 fault can then only mean the cursor is done. If Bronto drops
+        the session mid-cursor anyway, or a reply is lost after its
+        request went out, the search starts over from the createdDate of
+        the last row read, and rows created at that instant are read
+        twice. A read is never just sent again, since a NEXT the server
+        already answered would skip a page.
+        """
+        LOGGER.info("Fetching activities ({}) from {} to {}".format(
+            self.partition_name(position), start, end))
+
+        readDirection = 'FIRST'
+        session_id = None
+        last_page = None
+        restarted_at = None
+        skipped = self.skipped_types(position)
+
+        hasMore = True
+
+        while hasMore:
+            if readDirection == 'FIRST':
+                request = self.search_request(start, end, position)
+
+            try:
+                results = self.read(request, session_id=session_id,
+                                    readDirection=readDirection)
+            except (SessionExpired, ReplyLost) as e:
+                if last_page is not None:
+                    start = self.last_created(last_page)
+
+                if start == restarted_at:
+                    raise
+
+                LOGGER.warn('{}, restarting activities ({}) from {}.'
+                            .format(e, self.partition_name(position),
+                                    start))
+
+                restarted_at = start
+                readDirection = 'FIRST'
+                session_id = None
+                continue
+            except suds.WebFault as e:
+                if fault_code(e) == END_OF_RESULTS:
+                    hasMore = False
+                    break
+                else:
+                    raise
+
+            session_id = self.session_id()
+
+            LOGGER.info('... {} results'.format(len(results)))
+
+            with self._stats_lock:
+                stats = self.partition_stats[position]
+                stats['records'] += len(results)
+                stats['pages'] += 1
+
+            if skipped is None:
+                yield results
+            else:
+                yield self.drop_types(results, skipped)
+
+            readDirection = 'NEXT'
+
+            if len(results) == 0:
+                hasMore = False
+            else:
+                last_page = results
+
+    def drop_types(self, results, types):
+        if isinstance(results, RawPage):
+            return RawPage(results.body, results.parser,
+                           skip={'activityType': types})
+
+        return [result for result in results
+                if getattr(result, 'activityType', None) not in types]
+
+    def search_request(self, start, end, position):
+        _filter = self.make_filter(start, end, self.partitions[position])
+        _filter.readDirection = Variable('readDirection')
+
+        return self.request(self.OPERATION, _filter)
+
+    def last_created(self, results):
+        """
+        The createdDate of the last row of a page, as read from Bronto.
+        """
+        for result in results:
+            last = result
+
+        return last.createdDate
+
+    def transform_page(self, results):
+        return self.ids([self.transform(result) for result in results])
+
+    def page_job(self):
+        return PageJob(self.TABLE, self.catalog.get('schema'),
+                       finish=self.ids, **self.page_job_options())
+
+    def close(self):
+        if self.partitioner is not None:
+            self.partitioner.shutdown()
+            self.partitioner = None
+
+        super().close()
+
+    def log_summary(self):
+        super().log_summary()
+
+        if self.ids is not None:
+            self.ids.log(self.TABLE)
+
+        if len(self.partitions) > 1:
+            for position, stats in enumerate(self.partition_stats):
+                LOGGER.info('{}: partition {} read {} records in {} pages'
+                            .format(self.TABLE,
+                                    self.partition_name(position),
+                                    stats['records'], stats['pages']))
@@ -1,23 +1,33 @@
-from tap_bronto.schemas import get_field_selector, is_selected, \
+from tap_bronto.envelope import Variable
+from tap_bronto.schemas import get_transformer, is_selected, \
     CONTACT_SCHEMA
-from tap_bronto.state import incorporate, save_state
 from tap_bronto.stream import Stream
+from tap_bronto.transport import ReplyLost
+from tap_bronto.workers import PageJob
+from tap_bronto.windows import WindowSizer
 from funcy import project
 
-from datetime import datetime, timedelta
+from datetime import timedelta
 
-import pytz
 import singer
 import socket
-import suds
 
 LOGGER = singer.get_logger()  # noqa
 
+DAY = timedelta(days=1)
+
+
+def whole_days(value):
+    return DAY * max(-(-value // DAY), 1)
+
 
 class ContactStream(Stream):
 
     TABLE = 'contact'
     KEY_PROPERTIES = ['id']
+    WINDOW = timedelta(days=1)
+    MIN_WINDOW = timedelta(days=1)
+    MAX_WINDOW = timedelta(days=30)
     SCHEMA = CONTACT_SCHEMA
 
     def make_filter(self, start, end):
@@ -35,24 +45,67 @@ class ContactStream(Stream):
 
         return _filter
 
+    def windows(self, start, sizer, until=None):
+        """
+        The AfterOrSameDay and Before operators only compare dates, so a
+        window that doesn't start and end on midnight gets widened to
+        whole days by the API and overlaps its neighbours. In the
+        default `day` mode, windows are whole UTC days instead, so every
+        contact is read once per run. `contact_window_mode: hour` brings
+        back the old six hour windows.
+        """
+        if self.config.get('contact_window_mode', 'day') != 'day':
+            yield from super().windows(start, sizer, until)
+            return
+
+        end = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        limit = until or self.end
+
+        while end < (until or self.range_end()):
+            start = end
+            end = start + timedelta(days=max(sizer.size.days, 1))
+
+            if limit is not None:
+                end = min(end, limit)
+
+            yield start, end
+
+    def window_sizer(self):
+        if self.config.get('contact_window_mode', 'day') == 'day':
+            sizer = super().window_sizer()
+            bounds = (sizer.size, sizer.minimum, sizer.maximum)
+
+            if any(bound % DAY for bound in bounds):
+                sizer.size, sizer.minimum, sizer.maximum = \
+                    [whole_days(bound) for bound in bounds]
+
+                LOGGER.warn('{}: window_sizes are rounded up to whole '
+                            'days in contact_window_mode day, using {} '
+                            'from {} to {}.'.format(
+                                self.TABLE, sizer.size, sizer.minimum,
+                                sizer.maximum))
+
+            return sizer
+
+        return WindowSizer.from_config(
+            self.config, self.TABLE, timedelta(hours=6),
+            timedelta(hours=1), timedelta(days=7))
+
     def any_selected(self, field_names):
         sub_catalog = project(field_names, self.catalog.get('schema'))
         return any([is_selected(field_catalog)
                     for field_catalog in sub_catalog])
 
     def sync(self):
-        key_properties = self.catalog.get('key_properties')
         table = self.TABLE
 
-        singer.write_schema(
-            self.catalog.get('stream'),
-            self.catalog.get('schema'),
-            key_properties=key_properties)
+        self.write_schema()
 
         self.login()
 
-        field_selector = get_field_selector(
-            self.catalog.get('schema'))
+        self.transform = get_transformer(
+            self.catalog.get('schema'),
+            flatten=['readOnlyContactData'])
 
         includeGeoIpData = self.any_selected([
             'geoIPCity', 'geoIPStateRegion', 'geoIPZip',
@@ -85,76 +138,65 @@ class ContactStream(Stream):
         if includeEngagementData:
             LOGGER.info('Including engagement data.')
 
+        self.includes = {
+            'includeGeoIpData': includeGeoIpData,
+            'includeTechnologyData': includeTechnologyData,
+            'includeRFMData': includeRFMData,
+            'includeEngagementData': includeEngagementData,
+        }
+
         LOGGER.info('Syncing contacts.')
 
         start = self.get_start_date(table)
-        end = start
-        interval = timedelta(hours=6)
-
-        def flatten(item):
-            read_only_data = item.get('readOnlyContactData', {})
-            item.pop('readOnlyContactData', None)
-            return {**item, **read_only_data}
 
-        while end < datetime.now(pytz.utc):
-            self.login()
-            start = end
-            end = start + interval
-            LOGGER.info("Fetching contacts modified from {} to {}".format(
-                start, end))
-
-            _filter = self.make_filter(start, end)
-            field_selector = get_field_selector(
-                self.catalog.get('schema'))
-
-            pageNumber = 1
-            hasMore = True
+        self.sync_windows(start, 'modified')
 
-            while hasMore:
-                retry_count = 0
+        LOGGER.info("Done syncing contacts.")
 
-                self.login()
+    def read_window(self, start, end):
+        LOGGER.info("Fetching contacts modified from {} to {}".format(
+            start, end))
 
-                try:
-                    results = self.client.service.readContacts(
-                        filter=_filter,
-                        includeLists=True,
-                        fields=[],
-                        pageNumber=pageNumber,
-                        includeSMSKeywords=True,
-                        includeGeoIpData=includeGeoIpData,
-                        includeTechnologyData=includeTechnologyData,
-                        includeRFMData=includeRFMData,
-                        includeEngagementData=includeEngagementData)
+        request = self.request(
+            'readContacts',
+            filter=self.make_filter(start, end),
+            includeLists=True,
+            fields=[],
+            pageNumber=Variable('pageNumber'),
+            includeSMSKeywords=True,
+            **self.includes)
 
-                except socket.timeout:
-                    retry_count += 1
-                    if retry_count >= 5:
-                        LOGGER.error("Retried more than five times, moving on!")
-                        raise
-                    LOGGER.warn("Timeout caught, retrying request")
-                    continue
+        pageNumber = 1
+        hasMore = True
 
-                pageNumber = pageNumber + 1
+        while hasMore:
+            retry_count = 0
 
-                result_dicts = [suds.sudsobject.asdict(result)
-                                for result in results]
+            try:
+                results = self.read(request, pageNumber=pageNumber)
 
-                flattened = [flatten(result) for result in result_dicts]
+            except (socket.timeout, ReplyLost):
+                retry_count += 1
+                self.metrics.count('retries')
+                if retry_count >= 5:
+                    LOGGER.error("Retried more than five times, moving on!")
+                    raise
+                LOGGER.warn("Timeout caught, retrying request")
+                continue
 
-                LOGGER.info("... {} results".format(len(flattened)))
+            pageNumber = pageNumber + 1
 
-                singer.write_records(
-                    table,
-                    [field_selector(result) for result in flattened])
+            LOGGER.info("... {} results".format(len(results)))
 
-                if len(results) == 0:
-                    hasMore = False
+            yield results
 
-            self.state = incorporate(
-                self.state, table, 'modified',
-                start.replace(microsecond=0).isoformat())
+            if len(results) == 0:
+                hasMore = False
 
-            save_state(self.state)
+    def transform_page(self, results):
+        return [self.transform(result) for result in results]
 
-        LOGGER.info("Done syncing contacts.")
+    def page_job(self):
+        return PageJob(self.TABLE, self.catalog.get('schema'),
+                       flatten=['readOnlyContactData'],
+                       **self.page_job_options())
@@ -1,8 +1,7 @@
-from tap_bronto.schemas import with_properties, get_field_selector
+from tap_bronto.schemas import with_properties, get_transformer
 from tap_bronto.stream import Stream
 
 import singer
-import suds
 
 LOGGER = singer.get_logger()  # noqa
 
@@ -56,28 +55,32 @@ class ListStream(Stream):
     })
 
     def sync(self):
-        key_properties = self.catalog.get('key_properties')
-        table = self.TABLE
-
-        singer.write_schema(
-            self.catalog.get('stream'),
-            self.catalog.get('schema'),
-            key_properties=key_properties)
+        self.write_schema()
 
         self.login()
 
-        hasMore = True
-        pageNumber = 1
-        field_selector = get_field_selector(
-            self.catalog.get('schema'))
+        self.transform = get_transformer(self.catalog.get('schema'))
 
         LOGGER.info('Syncing lists.')
 
-        while hasMore:
-            self.login()
+        for results in self.prefetch(self.read_pages()):
+            self.write_page(self.transform_page(results))
+
+        LOGGER.info("Done syncing lists.")
 
+    def read_pages(self):
+        """
+        Lists aren't read in date windows, so this stream pages through
+        them itself instead of going through sync_windows and
+        read_window.
+        """
+        hasMore = True
+        pageNumber = 1
+
+        while hasMore:
             LOGGER.info("... page {}".format(pageNumber))
-            results = self.client.service.readLists(
+            results = self.call(
+                'readLists',
                 1,  # weird hack -- this just happens to work if we
                     # pass 1 as the filter. Other values like None
                     # did not work
@@ -88,12 +91,10 @@ class ListStream(Stream):
 
             pageNumber = pageNumber + 1
 
-            singer.write_records(
-                table,
-                [field_selector(suds.sudsobject.asdict(result))
-                 for result in results])
+            yield results
 
             if len(results) == 0:
                 hasMore = False
 
-        LOGGER.info("Done syncing lists.")
+    def transform_page(self, results):
+        return [self.transform(result) for result in results]
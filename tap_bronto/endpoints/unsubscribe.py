@@ -1,12 +1,10 @@
-from tap_bronto.schemas import with_properties, get_field_selector
-from tap_bronto.state import incorporate, save_state
+from tap_bronto.envelope import Variable
+from tap_bronto.schemas import with_properties, get_transformer
 from tap_bronto.stream import Stream
 
-from datetime import datetime, timedelta
+from datetime import timedelta
 
-import pytz
 import singer
-import suds
 
 LOGGER = singer.get_logger()  # noqa
 
@@ -15,6 +13,9 @@ class UnsubscribeStream(Stream):
 
     TABLE = 'unsubscribe'
     KEY_PROPERTIES = ['contactId', 'method', 'created']
+    WINDOW = timedelta(hours=6)
+    MIN_WINDOW = timedelta(hours=1)
+    MAX_WINDOW = timedelta(hours=24 * 30)
     SCHEMA = with_properties({
         'contactId': {
             'type': ['string'],
@@ -69,57 +70,43 @@ class UnsubscribeStream(Stream):
         return _filter
 
     def sync(self):
-        key_properties = self.catalog.get('key_properties')
         table = self.TABLE
 
-        singer.write_schema(
-            self.catalog.get('stream'),
-            self.catalog.get('schema'),
-            key_properties=key_properties)
+        self.write_schema()
+
+        self.transform = get_transformer(self.catalog.get('schema'))
 
         start = self.get_start_date(table)
-        end = start
-        interval = timedelta(hours=6)
 
         LOGGER.info('Syncing unsubscribes.')
 
-        while end < datetime.now(pytz.utc):
-            self.login()
-            start = end
-            end = start + interval
-            LOGGER.info("Fetching unsubscribes from {} to {}".format(
-                start, end))
+        self.login()
 
-            hasMore = True
-            _filter = self.make_filter(start, end)
-            pageNumber = 1
+        self.sync_windows(start, 'start_date')
 
-            field_selector = get_field_selector(
-                self.catalog.get('schema'))
+        LOGGER.info("Done syncing unsubscribes.")
 
-            while hasMore:
-                self.login()
-                LOGGER.info("... page {}".format(pageNumber))
-                results = self.client.service.readUnsubscribes(
-                    _filter, pageNumber)
-                pageNumber = pageNumber + 1
+    def read_window(self, start, end):
+        LOGGER.info("Fetching unsubscribes from {} to {}".format(
+            start, end))
 
-                singer.write_records(
-                    table,
-                    [field_selector(suds.sudsobject.asdict(result))
-                     for result in results])
+        hasMore = True
+        request = self.request('readUnsubscribes',
+                               self.make_filter(start, end),
+                               Variable('pageNumber'))
+        pageNumber = 1
 
-                LOGGER.info("... {} results".format(len(results)))
+        while hasMore:
+            LOGGER.info("... page {}".format(pageNumber))
+            results = self.send(request, pageNumber=pageNumber)
+            pageNumber = pageNumber + 1
 
-                if len(results) == 0:
-                    hasMore = False
+            LOGGER.info("... {} results".format(len(results)))
 
-                self.state = incorporate(
-                    self.state,
-                    table,
-                    'start_date',
-                    start.isoformat())
+            yield results
 
-                save_state(self.state)
+            if len(results) == 0:
+                hasMore = False
 
-        LOGGER.info("Done syncing unsubscribes.")
+    def transform_page(self, results):
+        return [self.transform(result) for result in results]
@@ -0,0 +1,109 @@
+import re
+import time
+
+from suds.client import SoapClient
+from suds.plugin import PluginContainer
+from suds.sax import encoder
+from suds.transport import Request, TransportError
+
+from tap_bronto.session import add_session_header, session_header
+
+
+class Variable(str):
+    """
+    Placeholder for a request field that changes from one page to the
+    next. suds marshals it like any other string, leaving a marker in
+    the envelope that EnvelopeTemplate fills in before each send.
+    """
+
+    def __new__(cls, name):
+        variable = super().__new__(cls, '@@{}@@'.format(name))
+        variable.name = name
+
+        return variable
+
+
+MARKER = re.compile(r'@@(\w+)@@')
+
+SESSION_ID = 'sessionId'
+
+
+class EnvelopeTemplate:
+    """
+    The SOAP envelope for one call, marshalled by suds once and then
+    re-sent with only its Variables (and the session id) replaced, so
+    paging through a window doesn't marshal the same filter each time.
+    """
+
+    def __init__(self, client, operation, args, kwargs):
+        self.operation = operation
+        self.method = getattr(client.service, operation).method
+
+        envelope = self.method.binding.input.get_message(
+            self.method, args, kwargs)
+
+        add_session_header(envelope.root(),
+                           session_header(client).namespace,
+                           Variable(SESSION_ID))
+
+        # Even positions hold literal text, odd positions variable names.
+        self.parts = MARKER.split(envelope.plain())
+
+    def render(self, values):
+        parts = list(self.parts)
+
+        for index in range(1, len(parts), 2):
+            parts[index] = encoder.encode(str(values[parts[index]]))
+
+        return ''.join(parts).encode('utf-8')
+
+    def send(self, client, values, raw=False, metrics=None):
+        """
+        Sends the envelope through `client`, the way SoapClient.send
+        does. Returns the raw reply body if `raw` is set, or the
+        unmarshalled result. Faults are raised as WebFaults. The request
+        and unmarshalling are timed in the stream's `metrics`, if given.
+        """
+        values = dict(values)
+        values[SESSION_ID] = session_header(client).session_id
+
+        soap_client = SoapClient(client, self.method)
+        binding = self.method.binding.input
+        plugins = PluginContainer(client.options.plugins)
+
+        envelope = self.render(values)
+        plugins.message.sending(envelope=envelope)
+
+        request = Request(soap_client.location(), envelope)
+        request.headers = soap_client.headers()
+
+        started = time.perf_counter()
+
+        try:
+            reply = client.options.transport.send(request)
+
+        except TransportError as error:
+            if metrics is not None:
+                metrics.request(self.operation,
+                                time.perf_counter() - started, 0,
+                                error.httpcode)
+
+            if error.httpcode in (202, 204):
+                return None
+
+            return soap_client.failed(binding, error)
+
+        if metrics is not None:
+            metrics.request(self.operation, time.perf_counter() - started,
+                            len(reply.message), reply.code)
+
+        reply = plugins.message.received(reply=reply.message).reply
+
+        if raw:
+            return reply
+
+        if metrics is None:
+            return soap_client.succeeded(binding, reply)
+
+        with metrics.timer('parse'):
+            return soap_client.succeeded(binding, reply)
@@ -0,0 +1,137 @@
+import functools
+import hashlib
+import operator
+
+import singer
+
+LOGGER = singer.get_logger()  # noqa
+
+
+ACTIVITY_ID_FIELDS = ('createdDate', 'activityType', 'contactId',
+                      'listId', 'segmentId', 'keywordId', 'messageId')
+
+extract_id_fields = operator.itemgetter(*ACTIVITY_ID_FIELDS)
+
+DIGESTS = {
+    'md5': hashlib.md5,
+    'sha256': hashlib.sha256,
+    'blake2b': functools.partial(hashlib.blake2b, digest_size=16),
+}
+
+
+class ActivityIds:
+    """
+    Builds the synthetic `id` of activity records: a digest of their
+    non-empty identifying fields joined with '|'. With the default md5
+    digest these are the ids the tap has always emitted. `sha256` makes
+    them longer and collision resistant, `blake2b` is faster and keeps
+    md5's length; both change every id.
+
+    Empty fields are left out of the joined string, so two records that
+    differ only in which field holds a value can end up with the same
+    id. Records with empty fields are counted, and with `audit` on, ids
+    seen with two different sets of empty fields are counted as
+    collisions.
+
+    Instances are also the `finish` step of activity PageJobs. A pickled
+    copy starts with fresh counters, which it hands back through
+    take_stats() to be merged into the original.
+    """
+
+    def __init__(self, digest='md5', audit=False):
+        if digest not in DIGESTS:
+            raise RuntimeError('Unknown activity_id_digest {}, expected '
+                               'one of {}.'.format(
+                                   digest, ', '.join(sorted(DIGESTS))))
+
+        self.digest = digest
+        self.audit = audit
+        self.remote = False
+        self.reset()
+
+    def reset(self):
+        self.records = 0
+        self.dropped = 0
+        self.collisions = 0
+        self.signatures = {}
+        self.observed = []
+
+    def __getstate__(self):
+        return {'digest': self.digest, 'audit': self.audit}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+        # Collisions can only be told apart against every id the stream
+        # has built, so a copy collects its ids for the original to
+        # check.
+        self.remote = True
+
+    def __call__(self, records):
+        new = DIGESTS[self.digest]
+        observed = []
+        dropped = 0
+
+        for record in records:
+            try:
+                values = extract_id_fields(record)
+            except KeyError:
+                # Fields left out of the catalog are missing altogether.
+                values = tuple(map(record.get, ACTIVITY_ID_FIELDS))
+
+            present = [value for value in values if value]
+
+            record['id'] = new('|'.join(present).encode('utf-8')) \
+                .hexdigest()
+
+            if len(present) < len(values):
+                dropped += 1
+
+            if self.audit:
+                observed.append((record['id'], tuple(map(bool, values))))
+
+        self.records += len(records)
+        self.dropped += dropped
+
+        if self.remote:
+            self.observed.extend(observed)
+        else:
+            self.check(observed)
+
+        return records
+
+    def check(self, observed):
+        for record_id, fields in observed:
+            seen = self.signatures.setdefault(record_id, fields)
+
+            if seen != fields:
+                self.collisions += 1
+
+    def take_stats(self):
+        stats = {
+            'records': self.records,
+            'dropped': self.dropped,
+            'observed': self.observed,
+        }
+
+        self.reset()
+
+        return stats
+
+    def merge(self, stats):
+        self.records += stats['records']
+        self.dropped += stats['dropped']
+
+        if self.audit:
+            self.check(stats['observed'])
+
+    def log(self, table):
+        message = ('{}: built {} activity ids, {} of them with empty '
+                   'fields left out'.format(
+                       table, self.records, self.dropped))
+
+        if self.audit:
+            message += ' ({} collisions between records with different ' \
+                       'empty fields)'.format(self.collisions)
+
+        LOGGER.info(message)
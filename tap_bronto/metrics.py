@@ -0,0 +1,159 @@
+import contextlib
+import threading
+import time
+
+import singer
+import singer.metrics
+
+from singer.metrics import Point, Tag
+
+LOGGER = singer.get_logger()  # noqa
+
+
+DEFAULT_LOG_INTERVAL = singer.metrics.DEFAULT_LOG_INTERVAL
+
+# Where a stream's time goes: waiting on the API for a reply, turning
+# the reply into suds objects, turning those into records, and writing
+# the records out to the target.
+PHASES = ('request', 'parse', 'transform', 'write')
+
+COUNTERS = ('requests', 'response_bytes', 'logins', 'session_retries',
+            'retries', 'windows', 'split_windows', 'pages', 'records')
+
+
+class StreamMetrics:
+    """
+    Times and counts what one stream does, from every thread it runs
+    on. Each request is logged as a Singer `http_request_duration`
+    METRIC, records as a `record_count` METRIC every `log_interval`
+    seconds, and the totals as METRICs and a summary line when the
+    stream closes.
+
+    Phases on different threads overlap, so with prefetching or
+    parallel windows their seconds can add up to more than the wall
+    time. With `fast_parse`, rows are parsed while they're transformed
+    and count as transform; on worker processes neither is timed.
+    """
+
+    def __init__(self, table, log_interval=DEFAULT_LOG_INTERVAL):
+        self.table = table
+        self.log_interval = log_interval
+
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.counts = dict.fromkeys(COUNTERS, 0)
+
+        self.started = time.monotonic()
+        self.logged_at = self.started
+        self.logged_records = 0
+
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Streams are all set up before the first one syncs, so the clock
+        is restarted when this one does.
+        """
+        self.started = self.logged_at = time.monotonic()
+
+    @classmethod
+    def from_config(cls, config, table):
+        return cls(table, float(config.get('metrics_log_interval',
+                                           DEFAULT_LOG_INTERVAL)))
+
+    def tags(self, **tags):
+        return dict(tags, **{Tag.endpoint: self.table})
+
+    def emit(self, metric_type, metric, value, tags):
+        singer.metrics.log(LOGGER, Point(metric_type, metric, value, tags))
+
+    def add(self, phase, seconds):
+        with self._lock:
+            self.seconds[phase] += seconds
+
+    def count(self, counter, amount=1):
+        with self._lock:
+            self.counts[counter] += amount
+
+    @contextlib.contextmanager
+    def timer(self, phase):
+        started = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - started)
+
+    def request(self, operation, seconds, size, status_code):
+        with self._lock:
+            self.seconds['request'] += seconds
+            self.counts['requests'] += 1
+            self.counts['response_bytes'] += size
+
+        status = singer.metrics.Status.succeeded
+
+        if status_code is None or status_code >= 300:
+            status = singer.metrics.Status.failed
+
+        self.emit('timer', singer.metrics.Metric.http_request_duration,
+                  seconds, self.tags(**{
+                      'operation': operation,
+                      'response_bytes': size,
+                      Tag.http_status_code: status_code,
+                      Tag.status: status,
+                  }))
+
+    def page(self, records):
+        now = time.monotonic()
+
+        with self._lock:
+            if records:
+                self.counts['pages'] += 1
+
+            self.counts['records'] += records
+
+            if now - self.logged_at <= self.log_interval:
+                return
+
+            records = self.counts['records'] - self.logged_records
+            self.logged_records = self.counts['records']
+            self.logged_at = now
+
+        self.emit('counter', singer.metrics.Metric.record_count, records,
+                  self.tags())
+
+    def log(self):
+        elapsed = time.monotonic() - self.started
+
+        with self._lock:
+            seconds = dict(self.seconds)
+            counts = dict(self.counts)
+            unlogged = counts['records'] - self.logged_records
+            self.logged_records = counts['records']
+
+        self.emit('counter', singer.metrics.Metric.record_count, unlogged,
+                  self.tags())
+
+        for counter in COUNTERS:
+            if counter != 'records':
+                self.emit('counter', counter, counts[counter], self.tags())
+
+        for phase in PHASES:
+            self.emit('timer', 'phase_duration', seconds[phase],
+                      self.tags(phase=phase))
+
+        self.emit('timer', singer.metrics.Metric.job_duration, elapsed,
+                  self.tags(**{Tag.job_type: 'stream'}))
+
+        LOGGER.info(
+            '{}: {} records in {} pages and {} windows in {:.1f}s. '
+            '{} requests returned {:.1f} MB; {}. {} logins, {} session '
+            'retries, {} retries.'.format(
+                self.table, counts['records'], counts['pages'],
+                counts['windows'], elapsed, counts['requests'],
+                counts['response_bytes'] / 1e6,
+                ', '.join('{} {:.1f}s ({:.0%})'.format(
+                    phase, seconds[phase],
+                    seconds[phase] / elapsed if elapsed else 0.0)
+                    for phase in PHASES),
+                counts['logins'], counts['session_retries'],
+                counts['retries']))
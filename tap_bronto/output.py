@@ -0,0 +1,229 @@
+import json
+import queue
+import sys
+import threading
+import time
+
+import singer
+import singer.messages
+
+LOGGER = singer.get_logger()  # noqa
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+DEFAULT_BUFFER_BYTES = 1024 * 1024
+DEFAULT_FLUSH_SECONDS = 1.0
+
+RECORD_SUFFIX = b'}\n'
+
+_dumps = json.JSONEncoder(allow_nan=False).encode
+
+
+def dumps_json(value):
+    return _dumps(value).encode('utf-8')
+
+
+def dumps_orjson(value):
+    try:
+        return orjson.dumps(value)
+    except TypeError:
+        # e.g. integers wider than 64 bits, which json handles.
+        return dumps_json(value)
+
+
+def get_encoder(name='auto'):
+    """
+    Returns the function records are encoded with: orjson when it's
+    installed (or asked for by name), the stdlib json otherwise. Both
+    produce valid Singer JSON. Only json's output matches
+    singer.write_message byte for byte, since orjson writes compact,
+    unescaped UTF-8.
+    """
+    if name == 'json':
+        return dumps_json
+
+    if name not in ('auto', 'orjson'):
+        raise RuntimeError('Unknown output_encoder {}, expected "auto", '
+                           '"orjson" or "json".'.format(name))
+
+    if orjson is None:
+        if name == 'orjson':
+            raise RuntimeError('output_encoder is "orjson", but orjson '
+                               'is not installed.')
+
+        return dumps_json
+
+    return dumps_orjson
+
+
+def record_prefix(stream):
+    return '{{"type": "RECORD", "stream": {}, "record": '.format(
+        json.dumps(stream)).encode('utf-8')
+
+
+def format_message(message):
+    return '{}\n'.format(
+        singer.messages.format_message(message)).encode('utf-8')
+
+
+class Writer:
+    """
+    Writes Singer messages to stdout. Streams write through a Writer
+    instead of calling singer.write_* directly, so do_sync can decide how
+    output from several streams gets serialized.
+
+    Records are encoded behind a pre-encoded message prefix for their
+    stream and collected in a buffer, which is written out once it
+    holds `buffer_bytes`, once `flush_seconds` have passed since the
+    last write, and always right after a STATE message.
+    """
+
+    def __init__(self, encoder='auto', buffer_bytes=DEFAULT_BUFFER_BYTES,
+                 flush_seconds=DEFAULT_FLUSH_SECONDS):
+        self.dumps = get_encoder(encoder)
+        self.buffer_bytes = buffer_bytes
+        self.flush_seconds = flush_seconds
+
+        self.prefixes = {}
+        self.buffer = []
+        self.buffered = 0
+        self.flushed_at = time.monotonic()
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        return cls(
+            encoder=config.get('output_encoder', 'auto'),
+            buffer_bytes=int(config.get('output_buffer_bytes',
+                                        DEFAULT_BUFFER_BYTES)),
+            flush_seconds=float(config.get('output_flush_seconds',
+                                           DEFAULT_FLUSH_SECONDS)),
+            **kwargs)
+
+    def write_schema(self, stream, schema, key_properties):
+        self.write_messages([singer.SchemaMessage(
+            stream=stream,
+            schema=schema,
+            key_properties=key_properties)])
+
+    def write_records(self, stream, records):
+        if not records:
+            return
+
+        prefix = self.record_prefix(stream)
+        dumps = self.dumps
+
+        self.emit(b''.join([prefix + dumps(record) + RECORD_SUFFIX
+                            for record in records]))
+
+    def record_prefix(self, stream):
+        prefix = self.prefixes.get(stream)
+
+        if prefix is None:
+            prefix = self.prefixes[stream] = record_prefix(stream)
+
+        return prefix
+
+    def write_encoded(self, data):
+        """
+        Writes records that were already encoded, e.g. by a worker
+        process.
+        """
+        self.emit(data)
+
+    def write_state(self, state):
+        self.emit(format_message(singer.StateMessage(value=state)),
+                  flush=True)
+
+    def write_messages(self, messages):
+        self.emit(b''.join([format_message(message)
+                            for message in messages]))
+
+    def emit(self, data, flush=False):
+        self.buffer.append(data)
+        self.buffered += len(data)
+
+        if (flush or self.buffered >= self.buffer_bytes or
+                time.monotonic() - self.flushed_at >= self.flush_seconds):
+            self.flush()
+
+    def flush(self):
+        self.flushed_at = time.monotonic()
+
+        if not self.buffered:
+            return
+
+        data = b''.join(self.buffer)
+        self.buffer = []
+        self.buffered = 0
+
+        # Anything written to stdout as text has to go out first.
+        sys.stdout.flush()
+        output = getattr(sys.stdout, 'buffer', None)
+
+        if output is None:
+            sys.stdout.write(data.decode('utf-8'))
+            sys.stdout.flush()
+        else:
+            output.write(data)
+            output.flush()
+
+    def close(self):
+        self.flush()
+
+
+class ThreadedWriter(Writer):
+    """
+    Hands encoded batches of messages to a single writer thread, so
+    streams syncing on different threads never interleave partial lines
+    on stdout. Each stream's messages are written in the order it
+    produced them. The queue is bounded, so a slow target blocks the
+    streams rather than buffering their output in memory.
+    """
+
+    def __init__(self, max_pending_batches=100, **kwargs):
+        super().__init__(**kwargs)
+
+        self.queue = queue.Queue(maxsize=max_pending_batches)
+        self.error = None
+
+        self.thread = threading.Thread(target=self.run,
+                                       name='singer-writer',
+                                       daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_seconds or None)
+            except queue.Empty:
+                item = (b'', True)
+
+            if item is None:
+                return
+
+            if self.error is not None:
+                continue
+
+            try:
+                super().emit(*item)
+            except Exception as exception:
+                LOGGER.error('Writer thread failed: {}'.format(exception))
+                self.error = exception
+
+    def emit(self, data, flush=False):
+        if self.error is not None:
+            raise self.error
+
+        self.queue.put((data, flush))
+
+    def close(self):
+        self.queue.put((b'', True))
+        self.queue.put(None)
+        self.thread.join()
+
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,134 @@
+import queue
+import threading
+
+
+_DONE = object()
+
+
+def prefetch(pages, depth, executor):
+    """
+    Iterates `pages` on a thread from `executor`, keeping up to `depth`
+    pages ready ahead of the consumer. The next request goes out while
+    the current page is being transformed and written. Once `depth`
+    pages are waiting, the producer blocks, so a slow target slows the
+    reads down instead of growing memory.
+    """
+    yield from Prefetch(pages, depth, executor)
+
+
+class Prefetch:
+    """
+    What prefetch() does, but started as soon as it's created rather
+    than when the first page is asked for. Iterate it, or close() it to
+    stop the producer.
+    """
+
+    def __init__(self, pages, depth, executor):
+        self.buffer = queue.Queue(maxsize=depth)
+        self.stopped = threading.Event()
+        self.producer = executor.submit(self.produce, pages)
+
+    def put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def produce(self, pages):
+        try:
+            for page in pages:
+                if not self.put((page, None)):
+                    return
+
+            self.put((_DONE, None))
+
+        except BaseException as exception:
+            self.put((_DONE, exception))
+
+    def __iter__(self):
+        try:
+            while True:
+                page, error = self.buffer.get()
+
+                if page is _DONE:
+                    if error is not None:
+                        raise error
+
+                    return
+
+                yield page
+
+        finally:
+            self.close()
+
+    def close(self):
+        self.stopped.set()
+        self.producer.result()
+
+
+def interleave(sources, depth, executor):
+    """
+    Iterates every iterator in `sources` at the same time, each on its
+    own thread from `executor`, and yields `(position, page)` pairs in
+    the order pages arrive, `position` being the index of the source the
+    page came from. Each source keeps up to `depth` pages ready; once
+    they're all full, the sources block until the consumer catches up.
+    """
+    buffer = queue.Queue(maxsize=max(depth, 1) * len(sources))
+    stopped = threading.Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def produce(position, pages):
+        if stopped.is_set():
+            return
+
+        try:
+            for page in pages:
+                if not put((position, page, None)):
+                    return
+
+            put((position, _DONE, None))
+
+        except BaseException as exception:
+            put((position, _DONE, exception))
+
+    producers = [executor.submit(produce, position, pages)
+                 for position, pages in enumerate(sources)]
+
+    remaining = len(producers)
+
+    try:
+        while remaining:
+            position, page, error = buffer.get()
+
+            if page is _DONE:
+                if error is not None:
+                    raise error
+
+                remaining -= 1
+                continue
+
+            yield position, page
+
+    finally:
+        stopped.set()
+
+        for producer in producers:
+            producer.cancel()
+
+        for producer in producers:
+            if not producer.cancelled():
+                producer.result()
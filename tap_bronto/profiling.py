@@ -0,0 +1,171 @@
+import collections
+import cProfile
+import os
+import sys
+import threading
+
+from datetime import datetime, timezone
+
+import singer
+
+LOGGER = singer.get_logger()  # noqa
+
+
+DEFAULT_SAMPLE_INTERVAL = 0.01
+
+
+def frame_label(frame):
+    code = frame.f_code
+
+    return '{} ({}:{})'.format(code.co_name,
+                               os.path.basename(code.co_filename),
+                               code.co_firstlineno)
+
+
+def collapse(name, frame):
+    """
+    Returns the stack ending in `frame` as one line of the collapsed
+    format flamegraph.pl and speedscope read, outermost frame first,
+    under the name of its thread.
+    """
+    labels = []
+
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+
+    labels.append(name)
+    labels.reverse()
+
+    return ';'.join(label.replace(';', ':') for label in labels)
+
+
+class StackSampler(threading.Thread):
+    """
+    Every `interval` seconds, records where each of a stream's threads
+    is: the thread that syncs it, and the ones it started, which are
+    named after its table. Threads waiting on Bronto or on the target
+    are sampled too, so the stacks show wall time, not just CPU time.
+    """
+
+    def __init__(self, table, ident, interval=DEFAULT_SAMPLE_INTERVAL):
+        super().__init__(name='{}-profiler'.format(table), daemon=True)
+        self.prefix = '{}-'.format(table)
+        self.ident_sampled = ident
+        self.interval = interval
+
+        self.samples = 0
+        self.stacks = collections.Counter()
+        self.stopped = threading.Event()
+
+    def threads(self):
+        return {thread.ident: thread.name
+                for thread in threading.enumerate()
+                if thread.ident == self.ident_sampled or
+                (thread.name.startswith(self.prefix) and
+                 thread is not self)}
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            names = self.threads()
+            frames = sys._current_frames()
+
+            for ident, name in names.items():
+                frame = frames.get(ident)
+
+                if frame is not None:
+                    self.stacks[collapse(name, frame)] += 1
+
+            self.samples += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def write(self, path):
+        with open(path, 'w') as handle:
+            for stack, count in sorted(self.stacks.items()):
+                handle.write('{} {}\n'.format(stack, count))
+
+
+class StreamProfiler:
+    """
+    Profiles one stream's sync with cProfile, and samples the stacks of
+    every thread the stream runs on. cProfile only sees the thread that
+    runs sync(), but that thread does the transforming and writing;
+    reads on prefetch and partition threads show up in the samples.
+
+    Writes `<table>-<time>-<records>-records.prof`, for pstats or
+    snakeviz, and a `.folded` file of sampled stacks, for flamegraph.pl
+    or speedscope, to `directory`.
+    """
+
+    def __init__(self, directory, table, interval=DEFAULT_SAMPLE_INTERVAL,
+                 deterministic=True):
+        self.directory = directory
+        self.table = table
+        self.interval = interval
+        self.deterministic = deterministic
+
+        self.profile = None
+        self.sampler = None
+        self.started = None
+
+    @classmethod
+    def from_config(cls, config, table):
+        return cls(config['profile'], table,
+                   interval=float(config.get('profile_interval',
+                                             DEFAULT_SAMPLE_INTERVAL)),
+                   deterministic=config.get('profile_deterministic', True))
+
+    def start(self):
+        self.started = datetime.now(timezone.utc)
+
+        self.sampler = StackSampler(self.table, threading.get_ident(),
+                                    self.interval)
+        self.sampler.start()
+
+        if not self.deterministic:
+            return
+
+        self.profile = cProfile.Profile()
+
+        try:
+            self.profile.enable()
+
+        except ValueError as exception:
+            # From Python 3.12 on, only one cProfile can be enabled at a
+            # time, which parallel streams run into.
+            LOGGER.warn('{}: not running cProfile ({}), only sampling '
+                        'stacks.'.format(self.table, exception))
+            self.profile = None
+
+    def stop(self, records):
+        if self.profile is not None:
+            self.profile.disable()
+
+        self.sampler.stop()
+
+        base = os.path.join(self.directory, '{}-{}-{}-records'.format(
+            self.table, self.started.strftime('%Y%m%dT%H%M%SZ'), records))
+
+        written = [base + '.folded']
+
+        if self.profile is not None:
+            written.append(base + '.prof')
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.sampler.write(base + '.folded')
+
+            if self.profile is not None:
+                self.profile.dump_stats(base + '.prof')
+
+        except OSError as exception:
+            LOGGER.error('Failed to write the profile of {}: {}'
+                         .format(self.table, exception))
+            return
+
+        LOGGER.info('{}: took {} stack samples, profile written to {}'
+                    .format(self.table, self.sampler.samples,
+                            ', '.join(written)))
@@ -0,0 +1,208 @@
+import re
+import threading
+import time
+
+import singer
+import suds
+
+from suds.plugin import MessagePlugin
+from suds.sax.element import Element
+
+LOGGER = singer.get_logger()  # noqa
+
+
+# Bronto sessions expire after 20 minutes of inactivity. Renew a little
+# earlier than that so a long-running window doesn't trip over it.
+DEFAULT_MAX_AGE = 15 * 60
+
+FAULT_CODE = re.compile(r'\s*(\d+)\s*:')
+
+# Bronto's fault for a session id it doesn't know or has expired.
+INVALID_SESSION = 102
+SESSION_FAULTS = (INVALID_SESSION,)
+
+
+class SessionHeaderPlugin(MessagePlugin):
+    """
+    Adds the Bronto sessionHeader to outgoing envelopes. suds builds soap
+    headers from the options of the client that parsed the WSDL, which
+    every clone shares, so a per-client session can't be set through
+    the soapheaders option. Plugins are read from the clone's own
+    options, so each clone carries one of these instead.
+    """
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.session_id = None
+
+    def marshalled(self, context):
+        if self.session_id is None:
+            return
+
+        add_session_header(context.envelope, self.namespace,
+                           self.session_id)
+
+
+def add_session_header(envelope, namespace, session_id):
+    header = Element('sessionHeader', ns=namespace)
+    header.append(Element('sessionId').setText(session_id))
+
+    envelope.getChild('Header').append(header)
+
+
+def session_header(client):
+    for plugin in client.options.plugins:
+        if isinstance(plugin, SessionHeaderPlugin):
+            return plugin
+
+    raise RuntimeError('SOAP client has no session header plugin.')
+
+
+class SessionExpired(RuntimeError):
+    """
+    Raised when the API rejects a session a call was pinned to, which
+    can't be swapped for a new one without losing the call's context.
+    """
+
+
+def fault_code(fault):
+    """
+    Returns the Bronto error code of a WebFault, which leads its
+    faultstring, as in "102: Invalid session", or None.
+    """
+    faultstring = getattr(fault.fault, 'faultstring', '') or ''
+    match = FAULT_CODE.match(faultstring)
+
+    if match is None:
+        return None
+
+    return int(match.group(1))
+
+
+def is_session_fault(fault):
+    return fault_code(fault) in SESSION_FAULTS
+
+
+class SessionManager:
+    """
+    Keeps one Bronto session per API token and thread, shared by every
+    stream that runs on that thread. Bronto keeps one cursor per session
+    and operation, so threads reading the same operation at once, like
+    parallel windows or partitions, each need a session of their own.
+    A new session is only requested when the current one is older than
+    `max_age` seconds, or when the API rejects it.
+
+    Bronto keeps a search cursor's position with the session that read
+    its FIRST page, so a cursor's NEXT pages are pinned to that session
+    whatever its age, and are never retried on a new one.
+    """
+
+    def __init__(self, max_age=DEFAULT_MAX_AGE):
+        self.max_age = float(max_age)
+
+        self.logins = 0
+        self.retries = 0
+
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def session_id(self, client, token, metrics=None):
+        key = (token, threading.get_ident())
+
+        with self._lock:
+            session = self._sessions.get(key)
+
+        if session is not None:
+            session_id, created = session
+
+            if time.monotonic() - created < self.max_age:
+                return session_id
+
+            LOGGER.info('Session is older than {}s, logging in again.'
+                        .format(self.max_age))
+
+        session_id = client.service.login(token)
+
+        with self._lock:
+            self._sessions[key] = (session_id, time.monotonic())
+            self.logins += 1
+
+        if metrics is not None:
+            metrics.count('logins')
+
+        return session_id
+
+    def expire(self, token, session_id):
+        key = (token, threading.get_ident())
+
+        with self._lock:
+            session = self._sessions.get(key)
+
+            if session is not None and session[0] == session_id:
+                del self._sessions[key]
+
+    def apply(self, client, token, metrics=None):
+        session_id = self.session_id(client, token, metrics)
+        session_header(client).session_id = session_id
+
+        return session_id
+
+    def invoke(self, client, token, operation, invoke, metrics=None,
+               session_id=None):
+        """
+        Runs `invoke` with a session applied to `client`, logging in
+        again and retrying once if the API rejects the session. Logins
+        and retries are also counted in the calling stream's `metrics`.
+
+        With `session_id`, runs `invoke` on that session as is, and
+        raises SessionExpired if the API rejects it.
+        """
+        if session_id is not None:
+            return self.invoke_pinned(client, token, operation, invoke,
+                                      session_id)
+
+        session_id = self.apply(client, token, metrics)
+
+        try:
+            return invoke()
+
+        except suds.WebFault as fault:
+            if not is_session_fault(fault):
+                raise
+
+            LOGGER.warn('Session rejected during {} ({}), logging in '
+                        'again and retrying.'.format(
+                            operation, fault.fault.faultstring))
+
+            self.expire(token, session_id)
+            self.apply(client, token, metrics)
+            self.retries += 1
+
+            if metrics is not None:
+                metrics.count('session_retries')
+
+            return invoke()
+
+    def invoke_pinned(self, client, token, operation, invoke, session_id):
+        session_header(client).session_id = session_id
+
+        try:
+            return invoke()
+
+        except suds.WebFault as fault:
+            if not is_session_fault(fault):
+                raise
+
+            self.expire(token, session_id)
+
+            raise SessionExpired('Session rejected during {} ({})'.format(
+                operation, fault.fault.faultstring))
+
+    def stats(self):
+        return {
+            'logins': self.logins,
+            'session_retries': self.retries,
+        }
+
+
+SESSIONS = SessionManager()
@@ -0,0 +1,179 @@
+import argparse
+import json
+
+from datetime import timedelta
+
+import pytz
+import singer
+
+from dateutil.parser import parse
+
+from tap_bronto.state import STATE_SCHEMA, load_state
+
+LOGGER = singer.get_logger()  # noqa
+
+
+FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+def parse_shard(value):
+    """
+    Parses a `--shard` value like `3/8` into `(3, 8)`. Shards are
+    numbered from 0.
+    """
+    try:
+        index, count = [int(part) for part in value.split('/')]
+    except ValueError:
+        raise RuntimeError('Invalid shard {}, expected INDEX/COUNT, e.g. '
+                           '0/4.'.format(value))
+
+    if count < 1 or not 0 <= index < count:
+        raise RuntimeError('Invalid shard {}, INDEX has to be between 0 '
+                           'and COUNT - 1.'.format(value))
+
+    return index, count
+
+
+def parse_date(value):
+    parsed = parse(value)
+
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=pytz.utc)
+
+    return parsed
+
+
+def format_date(value):
+    return value.astimezone(pytz.utc).strftime(FORMAT)
+
+
+def floor_day(value):
+    return value.astimezone(pytz.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0)
+
+
+def shard_range(start, end, index, count):
+    """
+    Splits `start` to `end` into `count` ranges of whole UTC days and
+    returns the `index`th. The ends are rounded down to midnight, so
+    every shard started on the same day computes the same split, even
+    though `end` defaults to now.
+    """
+    start = floor_day(start)
+    end = max(floor_day(end), start)
+    days = (end - start).days
+
+    def boundary(position):
+        return start + timedelta(days=days * position // count)
+
+    return boundary(index), boundary(index + 1)
+
+
+def merge_ranges(table, entries):
+    """
+    Merges the bookmarks shards wrote for one table into how far the
+    table has been synced without a gap: through every range that was
+    completed, and up to the bookmark of the first one that wasn't.
+    """
+    labels = [entry['range'].get('shard') for entry in entries]
+
+    if all(labels):
+        counts = set(parse_shard(label)[1] for label in labels)
+        indexes = set(parse_shard(label)[0] for label in labels)
+
+        if len(counts) != 1 or indexes != set(range(counts.pop())):
+            raise RuntimeError('{}: expected the state of every shard, '
+                               'got shards {}.'.format(
+                                   table, ', '.join(sorted(labels))))
+
+    entries = sorted(entries,
+                     key=lambda entry: parse_date(entry['range']['start']))
+
+    position = parse_date(entries[0]['range']['start'])
+
+    for entry in entries:
+        start = parse_date(entry['range']['start'])
+        end = parse_date(entry['range']['end'])
+        last_record = parse_date(entry['last_record'])
+
+        if start > position:
+            LOGGER.warn('{}: nothing synced from {} to {}, stopping the '
+                        'bookmark there.'.format(table, position, start))
+            break
+
+        if last_record < end:
+            position = max(position, last_record)
+            LOGGER.warn('{}: range {} to {} only got to {}, stopping the '
+                        'bookmark there.'.format(
+                            table, start, end, last_record))
+            break
+
+        position = max(position, end)
+
+    return format_date(position)
+
+
+def merge_states(states):
+    """
+    Merges the states written by shards of one backfill into a single
+    state to continue incremental syncs from.
+    """
+    merged = {'bookmarks': {}}
+
+    for state in states:
+        STATE_SCHEMA(state)
+
+    tables = sorted(set(table for state in states
+                        for table in state.get('bookmarks', {})))
+
+    for table in tables:
+        entries = [state['bookmarks'][table] for state in states
+                   if table in state.get('bookmarks', {})]
+
+        ranged = [entry for entry in entries if 'range' in entry]
+
+        if ranged:
+            last_record = merge_ranges(table, ranged)
+        else:
+            last_record = max((entry['last_record'] for entry in entries),
+                              key=parse_date)
+
+        merged['bookmarks'][table] = {
+            'field': entries[0]['field'],
+            'last_record': last_record,
+        }
+
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=('Merges the state files written by the shards of a '
+                     'backfill (the last STATE message of each run) into '
+                     'one state file.'))
+
+    parser.add_argument(
+        'states', nargs='+', help='State file of each shard')
+    parser.add_argument(
+        '-o', '--output', help='File to write the merged state to')
+
+    args = parser.parse_args()
+
+    try:
+        merged = merge_states([load_state(filename)
+                               for filename in args.states])
+
+        if args.output is None:
+            print(json.dumps(merged))
+        else:
+            with open(args.output, 'w') as handle:
+                json.dump(merged, handle)
+
+    except BaseException as exception:
+        LOGGER.error(str(exception))
+        LOGGER.fatal("Merging states failed.")
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
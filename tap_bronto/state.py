@@ -1,17 +1,31 @@
+import copy
 import json
+import threading
+import time
+
+from datetime import datetime, timezone
 from dateutil.parser import parse
 
 import singer
 
-from voluptuous import Schema, Required
+from voluptuous import Schema, Required, Optional
 
 LOGGER = singer.get_logger()
 
+FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+DEFAULT_CHECKPOINT_SECONDS = 60
+
 STATE_SCHEMA = Schema({
     Required('bookmarks'): {
         str: {
             Required('last_record'): str,
             Required('field'): str,
+            Optional('range'): {
+                Required('start'): str,
+                Required('end'): str,
+                Optional('shard'): str,
+            },
         }
     }
 })
@@ -28,28 +42,91 @@ def get_last_record_value_for_table(state, table):
     return to_return
 
 
+def parse_watermark(value):
+    """
+    Returns a bookmark value, an ISO 8601 string or a datetime, as an
+    aware datetime that compares correctly whatever offset or precision
+    it was written with. Naive values are taken to be UTC.
+    """
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            parsed = parse(value)
+
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+
+    return parsed
+
+
+def format_watermark(value):
+    return value.astimezone(timezone.utc).strftime(FORMAT)
+
+
+def get_watermark(state, table):
+    last_record = state.get('bookmarks', {}) \
+                       .get(table, {}) \
+                       .get('last_record')
+
+    if last_record is None:
+        return None
+
+    return parse_watermark(last_record)
+
+
+def set_watermark(bookmarks, table, field, value, keep_range=False):
+    """
+    Moves `table`'s bookmark to `value`. The date range a sharded or
+    `sync_end` run left next to it is dropped unless `keep_range` is
+    set, so a later unranged run doesn't leave a stale range behind.
+    """
+    bookmark = dict(bookmarks.get(table, {}), field=field,
+                    last_record=format_watermark(value))
+
+    if not keep_range:
+        bookmark.pop('range', None)
+
+    bookmarks[table] = bookmark
+
+
 def incorporate(state, table, field, value):
     if value is None:
         return state
 
     new_state = state.copy()
+    new_state['bookmarks'] = new_state.get('bookmarks', {}).copy()
 
-    parsed = parse(value).strftime("%Y-%m-%dT%H:%M:%SZ")
+    value = parse_watermark(value)
+    current = get_watermark(state, table)
 
-    if 'bookmarks' not in new_state:
-        new_state['bookmarks'] = {}
+    if current is None or current < value:
+        set_watermark(new_state['bookmarks'], table, field, value)
 
-    if(new_state['bookmarks'].get(table, {}).get('last_record') is None or
-       new_state['bookmarks'].get(table, {}).get('last_record') < value):
-        new_state['bookmarks'][table] = {
-            'field': field,
-            'last_record': parsed,
-        }
+    return new_state
+
+
+def start_range(state, table, field, value):
+    """
+    Resets `table`'s bookmark to the start of the date range a sharded
+    run syncs, and records the range next to it, so merge-state can tell
+    how far each shard got.
+    """
+    new_state = state.copy()
+    new_state['bookmarks'] = new_state.get('bookmarks', {}).copy()
+
+    new_state['bookmarks'][table] = {
+        'field': field,
+        'last_record': value['start'],
+        'range': value,
+    }
 
     return new_state
 
 
-def save_state(state):
+def save_state(state, writer=None):
     if not state:
         return
 
@@ -57,7 +134,132 @@ def save_state(state):
 
     LOGGER.info('Updating state.')
 
-    singer.write_state(state)
+    if writer is None:
+        singer.write_state(state)
+    else:
+        writer.write_state(state)
+
+
+class StateManager:
+    """
+    Owns the state for a whole sync. Streams running on different
+    threads merge their bookmarks into it under a lock, and every
+    snapshot handed out is a deep copy, so a STATE message that is still
+    waiting to be written can't change underneath the writer.
+
+    Each table's bookmark is also kept as a datetime, so moving it only
+    parses the new value. Bookmarks are merged as soon as streams move
+    them, but checkpoint() only writes a STATE message once
+    `checkpoint_seconds` have passed since the last one, or
+    `checkpoint_records` records have been written since. With neither
+    set, every checkpoint is written. flush() writes any bookmark that
+    moved since the last STATE message, and streams call it when they
+    finish.
+    """
+
+    def __init__(self, state=None, checkpoint_seconds=0,
+                 checkpoint_records=0):
+        self.state = state or {}
+        self.checkpoint_seconds = checkpoint_seconds
+        self.checkpoint_records = checkpoint_records
+
+        self.watermarks = {}
+        self.ranged = set()
+        self.dirty = False
+        self.records = 0
+        self.saved_at = time.monotonic()
+
+        self.checkpoints = 0
+        self.saves = 0
+
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, state=None):
+        return cls(
+            state,
+            checkpoint_seconds=float(config.get(
+                'state_checkpoint_seconds', DEFAULT_CHECKPOINT_SECONDS)),
+            checkpoint_records=int(config.get(
+                'state_checkpoint_records', 0)))
+
+    def snapshot(self):
+        with self._lock:
+            return copy.deepcopy(self.state)
+
+    def watermark(self, table):
+        if table not in self.watermarks:
+            self.watermarks[table] = get_watermark(self.state, table)
+
+        return self.watermarks[table]
+
+    def incorporate(self, table, field, value):
+        if value is None:
+            return
+
+        value = parse_watermark(value)
+
+        with self._lock:
+            current = self.watermark(table)
+
+            if current is not None and value <= current:
+                return
+
+            self.watermarks[table] = value
+            set_watermark(self.state.setdefault('bookmarks', {}),
+                          table, field, value,
+                          keep_range=table in self.ranged)
+            self.dirty = True
+
+    def start_range(self, table, field, value):
+        with self._lock:
+            self.state = start_range(self.state, table, field, value)
+            self.ranged.add(table)
+            self.watermarks.pop(table, None)
+            self.dirty = True
+
+    def checkpoint(self, writer=None, records=0):
+        """
+        Writes the state if a bookmark moved and a checkpoint is due.
+        `records` is how many records the caller wrote since its last
+        checkpoint.
+        """
+        with self._lock:
+            self.checkpoints += 1
+            self.records += records
+
+            due = (not (self.checkpoint_seconds or
+                        self.checkpoint_records) or
+                   (self.checkpoint_seconds and
+                    time.monotonic() - self.saved_at >=
+                    self.checkpoint_seconds) or
+                   (self.checkpoint_records and
+                    self.records >= self.checkpoint_records))
+
+            if not (self.dirty and due):
+                return
+
+        self.save(writer)
+
+    def flush(self, writer=None):
+        if self.dirty:
+            self.save(writer)
+
+    def save(self, writer=None):
+        with self._lock:
+            state = copy.deepcopy(self.state)
+            self.dirty = False
+            self.records = 0
+            self.saved_at = time.monotonic()
+            self.saves += 1
+
+        save_state(state, writer)
+
+    def stats(self):
+        return {
+            'state_checkpoints': self.checkpoints,
+            'state_messages': self.saves,
+        }
 
 
 def load_state(filename):
@@ -1,13 +1,29 @@
+import collections
+import concurrent.futures
+import pytz
 import singer
 import suds
 import sys
+import time
 
-from tap_bronto.state import get_last_record_value_for_table
+from datetime import datetime
+from tap_bronto.audit import DuplicateAudit
+from tap_bronto.client import CLIENT_POOL
+from tap_bronto.emitted import EmittedIndex, DEFAULT_HORIZON_DAYS
+from tap_bronto.envelope import EnvelopeTemplate
+from tap_bronto.metrics import StreamMetrics
+from tap_bronto.output import Writer
+from tap_bronto.pipeline import prefetch, Prefetch
+from tap_bronto.session import session_header, SESSIONS
+from tap_bronto.shards import format_date, parse_date, parse_shard, \
+    shard_range
+from tap_bronto.state import StateManager, \
+    get_last_record_value_for_table
+from tap_bronto.streaming import RawPage, row_parser
+from tap_bronto.windows import PAGE_SIZE, WindowSizer
+from tap_bronto.workers import EncodedPage, WORKERS, encode_records
 from dateutil import parser
 
-
-BRONTO_WSDL = 'https://api.bronto.com/v4?wsdl'
-
 LOGGER = singer.get_logger()  # noqa
 
 
@@ -17,11 +33,136 @@ class Stream:
     KEY_PROPERTIES = []
     SCHEMA = {}
 
-    def __init__(self, config={}, state={}, catalog=[]):
-        self.client = None
+    # Initial, smallest and largest date window for incremental streams.
+    WINDOW = None
+    MIN_WINDOW = None
+    MAX_WINDOW = None
+
+    # Date field the emitted index files records under, for streams
+    # that can skip records they already emitted.
+    INDEX_FIELD = None
+
+    # Field whose last value on a page moves the bookmark, for streams
+    # that checkpoint page by page instead of window by window.
+    BOOKMARK_FIELD = None
+
+    def __init__(self, config={}, state={}, catalog=[], writer=None,
+                 state_manager=None):
         self.config = config
         self.state = state
         self.catalog = catalog
+        self.writer = writer or Writer()
+        self.state_manager = state_manager or StateManager(state)
+        self.audit = None
+        self.prefetcher = None
+        self.job = None
+        self.emitted = None
+        self.end = None
+        self.checkpointed_records = 0
+        self.metrics = StreamMetrics.from_config(config, self.TABLE)
+
+        if config.get('audit_duplicates'):
+            self.audit = DuplicateAudit(self.TABLE, self.KEY_PROPERTIES)
+
+        if config.get('emitted_index') and self.INDEX_FIELD is not None:
+            self.emitted = EmittedIndex(
+                config['emitted_index'], self.TABLE,
+                int(config.get('emitted_index_days',
+                               DEFAULT_HORIZON_DAYS)))
+
+    def write_schema(self):
+        self.writer.write_schema(
+            self.catalog.get('stream'),
+            self.catalog.get('schema'),
+            key_properties=self.catalog.get('key_properties'))
+
+    def write_records(self, records):
+        if self.audit is not None:
+            self.audit.observe(records)
+
+        self.writer.write_records(self.TABLE, records)
+
+    def write_page(self, page):
+        with self.metrics.timer('write'):
+            self._write_page(page)
+
+    def _write_page(self, page):
+        if isinstance(page, EncodedPage) and page.stats is not None:
+            self.job.finish.merge(page.stats)
+
+        if self.emitted is not None:
+            if not isinstance(page, EncodedPage):
+                options = self.page_job_options()
+                page = encode_records(
+                    page, self.writer.record_prefix(self.TABLE),
+                    self.writer.dumps, options['key_properties'],
+                    options['index_field'],
+                    bookmark_field=options['bookmark_field'])
+
+            page = self.emitted.filter(page)
+
+        self.metrics.page(len(page))
+
+        if not isinstance(page, EncodedPage):
+            self.write_records(page)
+            return
+
+        if self.audit is not None:
+            self.audit.observe_keys(page.keys, len(page))
+
+        self.writer.write_encoded(page.data)
+
+    def last_value(self, page):
+        """
+        Returns the BOOKMARK_FIELD of the last record on a page of
+        records or an EncodedPage, or None for an empty page.
+        """
+        if isinstance(page, EncodedPage):
+            return page.last_value
+
+        if not page or self.BOOKMARK_FIELD is None:
+            return None
+
+        return page[-1].get(self.BOOKMARK_FIELD)
+
+    def log_summary(self):
+        self.metrics.log()
+
+        if self.audit is not None:
+            self.audit.log()
+
+        if self.emitted is not None:
+            self.emitted.log()
+
+    def close(self):
+        if self.prefetcher is not None:
+            self.prefetcher.shutdown()
+            self.prefetcher = None
+
+        self.state_manager.flush(self.writer)
+
+        if self.emitted is not None:
+            try:
+                self.emitted.save()
+            except OSError as exception:
+                LOGGER.error('Failed to save the emitted index for {}: {}'
+                             .format(self.TABLE, exception))
+
+        self.log_summary()
+
+    def save_bookmark(self, field, value):
+        """
+        Moves the bookmark to `value`, and writes the state if a
+        checkpoint is due. Whatever is left is written when the stream
+        closes.
+        """
+        records = self.metrics.counts['records']
+
+        self.state_manager.incorporate(self.TABLE, field, value)
+        self.state_manager.checkpoint(self.writer,
+                                      records - self.checkpointed_records)
+
+        self.checkpointed_records = records
 
     def get_start_date(self, table):
         LOGGER.info('Choosing start date for table {}'.format(table))
@@ -55,20 +196,338 @@ class Stream:
                                .format(replication_method))
         return start
 
+    @property
+    def client(self):
+        return CLIENT_POOL.client()
+
     def login(self):
         try:
-            client = suds.client.Client(BRONTO_WSDL, timeout=3600)
-            session_id = client.service.login(
-                self.config.get('token'))
-            session_header = client.factory.create('sessionHeader')
-            session_header.sessionId = session_id
-            client.set_options(soapheaders=session_header)
-            self.client = client
+            SESSIONS.apply(self.client, self.config.get('token'),
+                           self.metrics)
 
         except suds.WebFault:
             LOGGER.fatal("Login failed!")
             sys.exit(1)
 
+    def call(self, operation, *args, **kwargs):
+        """
+        Calls `operation` through suds. The size of the reply isn't
+        known here, and unmarshalling it is timed as part of the
+        request.
+        """
+        client = self.client
+        started = time.perf_counter()
+        status_code = None
+
+        try:
+            result = SESSIONS.invoke(
+                client, self.config.get('token'), operation,
+                lambda: getattr(client.service, operation)(*args, **kwargs),
+                metrics=self.metrics)
+            status_code = 200
+        finally:
+            self.metrics.request(operation, time.perf_counter() - started,
+                                 0, status_code)
+
+        return result
+
+    def request(self, operation, *args, **kwargs):
+        """
+        Compiles the envelope for a paginated call once. Arguments that
+        change from page to page are given as Variables and passed by
+        name to send() or read().
+        """
+        return EnvelopeTemplate(self.client, operation, args, kwargs)
+
+    def session_id(self):
+        """
+        The session this thread's last request went out on.
+        """
+        return session_header(self.client).session_id
+
+    def send(self, request, raw=False, session_id=None, **values):
+        client = self.client
+
+        return SESSIONS.invoke(
+            client, self.config.get('token'), request.operation,
+            lambda: request.send(client, values, raw=raw,
+                                 metrics=self.metrics),
+            metrics=self.metrics, session_id=session_id)
+
+    def read(self, request, session_id=None, **values):
+        """
+        Sends one of the read* requests. With `fast_parse` enabled, the
+        reply comes back as a RawPage whose rows are parsed straight from
+        the response body while the page is transformed, instead of
+        through suds's object graph. Either way the result has a length
+        and iterates rows that the stream's transformer accepts. Worker
+        processes only take raw pages, so they imply `fast_parse`.
+
+        With `session_id`, the request is pinned to that session, as
+        send() describes.
+        """
+        if not (self.config.get('fast_parse') or WORKERS.enabled):
+            return self.send(request, session_id=session_id, **values)
+
+        return RawPage(self.send(request, raw=True, session_id=session_id,
+                                 **values),
+                       row_parser(self.client, request.operation))
+
+    def sync_range(self, start, bookmark_field):
+        """
+        Narrows the range a sync covers from `start` until now to the
+        `sync_start`, `sync_end` and `shard` settings, and returns the
+        start to sync from. When the range has an end, it is recorded
+        with the bookmark, which starts over from the range's start.
+        """
+        if self.config.get('sync_start'):
+            start = parse_date(self.config['sync_start'])
+
+        end = None
+
+        if self.config.get('sync_end'):
+            end = parse_date(self.config['sync_end'])
+
+        shard = self.config.get('shard')
+
+        if shard:
+            index, count = parse_shard(shard)
+            start, end = shard_range(
+                start, end or datetime.now(pytz.utc), index, count)
+
+        if end is None:
+            return start
+
+        LOGGER.info('{}: syncing from {} to {}{}.'.format(
+            self.TABLE, start, end,
+            ' as shard {}'.format(shard) if shard else ''))
+
+        self.end = end
+
+        value = {'start': format_date(start), 'end': format_date(end)}
+
+        if shard:
+            value['shard'] = shard
+
+        self.state_manager.start_range(self.TABLE, bookmark_field, value)
+
+        return start
+
+    def finish_range(self, bookmark_field):
+        """
+        Moves the bookmark to the end of a range that was synced to the
+        end.
+        """
+        if self.end is not None:
+            self.save_bookmark(bookmark_field, self.end)
+
+    def range_end(self):
+        return self.end or datetime.now(pytz.utc)
+
+    def windows(self, start, sizer, until=None):
+        """
+        Yields consecutive windows from `start`, each as long as the
+        sizer's current size, until the end of the range, or `until`.
+        """
+        end = start
+        limit = until or self.end
+
+        while end < (until or self.range_end()):
+            start = end
+            end = start + sizer.size
+
+            if limit is not None:
+                end = min(end, limit)
+
+            yield start, end
+
+    def read_window(self, start, end):
+        """Abstract: yields each page of raw results for one window."""
+        raise NotImplementedError
+
+    def window_pages(self, window, pages):
+        """
+        Returns how many pages the window sizer should count for
+        `window`, given the `pages` non-empty pages written for it.
+        """
+        return pages
+
+    def transform_page(self, results):
+        """Abstract: turns one page of raw results into records."""
+        raise NotImplementedError
+
+    def prefetch(self, pages):
+        depth = int(self.config.get('prefetch_pages', 2))
+
+        if depth < 1:
+            return pages
+
+        if self.prefetcher is None:
+            # One long-lived thread per stream, so it keeps its client
+            # and session from one window to the next.
+            self.prefetcher = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix='{}-prefetch'.format(self.TABLE))
+
+        return prefetch(pages, depth, self.prefetcher)
+
+    def page_job(self):
+        """
+        Describes how a worker process turns this stream's raw pages into
+        encoded records. Streams that return None are always transformed
+        in-process.
+        """
+        return None
+
+    def page_job_options(self):
+        key_properties = None
+
+        if self.audit is not None:
+            key_properties = self.KEY_PROPERTIES
+
+        index_field = None
+
+        if self.emitted is not None:
+            index_field = self.INDEX_FIELD
+
+        return {
+            'encoder': self.config.get('output_encoder', 'auto'),
+            'key_properties': key_properties,
+            'index_field': index_field,
+            'bookmark_field': self.BOOKMARK_FIELD,
+        }
+
+    def transform_pages(self, pages):
+        if WORKERS.enabled and self.job is None:
+            self.job = self.page_job()
+
+        if WORKERS.enabled and self.job is not None:
+            yield from WORKERS.map_pages(self.job, pages)
+            return
+
+        for results in pages:
+            with self.metrics.timer('transform'):
+                page = self.transform_page(results)
+
+            yield page
+
+    def sync_window(self, start, end):
+        return self.transform_pages(
+            self.prefetch(self.read_window(start, end)))
+
+    def window_sizer(self):
+        return WindowSizer.from_config(
+            self.config, self.TABLE,
+            self.WINDOW, self.MIN_WINDOW, self.MAX_WINDOW)
+
+    def sync_windows(self, start, bookmark_field):
+        """
+        Syncs every window from `start` until now, sizing each window
+        from how full the previous ones were. With `max_parallel_windows`
+        above 1, that many windows are read at once on a thread pool,
+        each keeping up to `prefetch_pages` transformed pages ahead of
+        the writer. Windows are written in order, so the bookmark moves
+        past each one as it's written, and a window that's waiting its
+        turn stops reading once its pages are buffered.
+        """
+        max_parallel_windows = int(
+            self.config.get('max_parallel_windows', 1))
+
+        start = self.sync_range(start, bookmark_field)
+        sizer = self.window_sizer()
+
+        def write_pages(window, pages):
+            self.metrics.count('windows')
+
+            records = 0
+            largest_page = 0
+            count = 0
+
+            # Pages of a window that can still be split are held back
+            # until it's clear the window isn't crowded. They're all
+            # partial pages, since the first full one splits it.
+            held = [] if sizer.splittable(*window) else None
+
+            for page in pages:
+                if page:
+                    records += len(page)
+                    largest_page = max(largest_page, len(page))
+                    count += 1
+
+                if held is None:
+                    self.write_page(page)
+
+                elif largest_page >= PAGE_SIZE:
+                    pages.close()
+                    split_window(window, records, count, largest_page)
+                    return
+
+                else:
+                    held.append(page)
+
+            for page in held or []:
+                self.write_page(page)
+
+            sizer.observe(window[0], window[1], records,
+                          self.window_pages(window, count), largest_page)
+
+        def split_window(window, records, count, largest_page):
+            self.metrics.count('split_windows')
+
+            sizer.observe(window[0], window[1], records, count,
+                          largest_page)
+
+            for part in self.windows(window[0], sizer, window[1]):
+                write_pages(part, self.sync_window(*part))
+
+                self.save_bookmark(bookmark_field, part[0])
+
+        if max_parallel_windows <= 1:
+            for window in self.windows(start, sizer):
+                write_pages(window, self.sync_window(*window))
+
+                self.save_bookmark(bookmark_field, window[0])
+
+            self.finish_range(bookmark_field)
+            return
+
+        windows = self.windows(start, sizer)
+        depth = max(int(self.config.get('prefetch_pages', 2)), 1)
+        in_flight = collections.deque()
+
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_parallel_windows,
+                thread_name_prefix='{}-window'.format(self.TABLE)) \
+                as executor:
+
+            def submit():
+                while len(in_flight) < max_parallel_windows:
+                    window = next(windows, None)
+
+                    if window is None:
+                        return
+
+                    in_flight.append((window, Prefetch(
+                        self.transform_pages(self.read_window(*window)),
+                        depth, executor)))
+
+            try:
+                submit()
+
+                while in_flight:
+                    window, pages = in_flight.popleft()
+                    write_pages(window, pages)
+
+                    self.save_bookmark(bookmark_field, window[0])
+
+                    submit()
+
+            finally:
+                for _, pages in in_flight:
+                    pages.close()
+
+        self.finish_range(bookmark_field)
+
     @classmethod
     def matches_catalog(cls, catalog):
         return catalog.get('stream') == cls.TABLE
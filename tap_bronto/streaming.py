@@ -0,0 +1,149 @@
+import io
+import threading
+
+from xml.etree import ElementTree
+
+
+RETURN_TAG = 'return'
+
+
+def local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+class Row:
+    """
+    A parsed result row. Like a suds object, its fields live in
+    __dict__, so the transformers from get_transformer() accept either.
+    """
+
+    def __init__(self, values):
+        self.__dict__ = values
+
+
+def compile_fields(complex_type):
+    """
+    Maps each child element of a WSDL complex type to how its text gets
+    converted: suds's own translator for builtin types, so values come
+    out exactly as suds would have produced them, or a nested field map
+    for complex children.
+    """
+    fields = {}
+
+    for child, _ in complex_type.children():
+        resolved = child.resolve()
+
+        if resolved.builtin():
+            fields[child.name] = (resolved.translate, child.unbounded(),
+                                  None)
+        else:
+            fields[child.name] = (None, child.unbounded(),
+                                  compile_fields(resolved))
+
+    return fields
+
+
+def parse_element(element, fields):
+    values = {}
+
+    for child in element:
+        name = local_name(child.tag)
+        spec = fields.get(name)
+
+        if spec is None:
+            continue
+
+        translate, many, nested = spec
+
+        if nested is None:
+            value = translate(child.text)
+        else:
+            value = Row(parse_element(child, nested))
+
+        if many:
+            values.setdefault(name, []).append(value)
+        else:
+            values[name] = value
+
+    return values
+
+
+class RowParser:
+    """
+    Parses the raw reply of one read* operation row by row, without
+    building the suds object graph for the whole page.
+    """
+
+    def __init__(self, client, operation):
+        method = getattr(client.service, operation).method
+        returned = method.binding.output.returned_types(method)[0]
+
+        self.operation = operation
+        self.fields = compile_fields(returned.resolve())
+
+    def rows(self, body, skip=None):
+        """
+        Yields the rows of `body`, leaving out those whose value for a
+        field in `skip` is in the set `skip` maps it to.
+        """
+        parents = []
+
+        for event, element in ElementTree.iterparse(
+                io.BytesIO(body), events=('start', 'end')):
+
+            if event == 'start':
+                parents.append(element)
+                continue
+
+            parents.pop()
+
+            if local_name(element.tag) != RETURN_TAG:
+                continue
+
+            values = parse_element(element, self.fields)
+
+            if not skip or not any(values.get(field) in skipped
+                                   for field, skipped in skip.items()):
+                yield Row(values)
+
+            # Drop the row from the tree once it's parsed. The page's
+            # body is still held, but no suds object graph is built
+            # for it.
+            if parents:
+                parents[-1].remove(element)
+
+
+class RawPage:
+    """
+    One page of a read* reply, kept as the raw response body. Rows are
+    only parsed while the page is iterated, which happens when it is
+    transformed, not when it is read. The whole body stays in memory
+    until the page is dropped. Its length counts every row in the body,
+    including those `skip` leaves out.
+    """
+
+    def __init__(self, body, parser, skip=None):
+        self.body = body
+        self.parser = parser
+        self.skip = skip
+        self.count = body.count('</{}>'.format(RETURN_TAG).encode('utf-8'))
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return self.parser.rows(self.body, self.skip)
+
+
+_PARSERS = {}
+_PARSERS_LOCK = threading.Lock()
+
+
+def row_parser(client, operation):
+    key = (id(client.wsdl), operation)
+
+    with _PARSERS_LOCK:
+        if key not in _PARSERS:
+            _PARSERS[key] = RowParser(client, operation)
+
+        return _PARSERS[key]
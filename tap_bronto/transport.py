@@ -0,0 +1,232 @@
+import http.client
+import io
+import queue
+import select
+import threading
+import zlib
+
+from urllib.parse import urlsplit
+
+import singer
+
+from suds.transport import Reply, Transport, TransportError
+
+LOGGER = singer.get_logger()  # noqa
+
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 3600
+
+CHUNK_SIZE = 64 * 1024
+
+# Errors that mean a kept-alive connection was closed by the other end
+# between two requests.
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected,
+                           http.client.CannotSendRequest,
+                           ConnectionResetError,
+                           BrokenPipeError)
+
+
+class ReplyLost(ConnectionError):
+    """
+    Raised when a POST was sent but its connection dropped before the
+    reply was read. The server may have processed it, so it isn't sent
+    again here: for a cursor read, that would skip a page.
+    """
+
+
+def is_dropped(connection):
+    """
+    Whether the other end closed an idle connection. Nothing should be
+    readable on it between requests, so anything is taken as the close.
+    """
+    if connection.sock is None:
+        return False
+
+    readable, _, _ = select.select([connection.sock], [], [], 0)
+
+    return bool(readable)
+
+
+class ConnectionPool:
+    """
+    Keeps up to `size` idle HTTP connections per host open between
+    requests. A connection is only ever used by one request at a time;
+    if none is idle a new one is opened, and connections returned to a
+    full pool are closed. Also counts the traffic of every transport
+    that draws on it.
+    """
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+
+        self.opened = 0
+        self.requests = 0
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _queue(self, key):
+        with self._lock:
+            if key not in self._idle:
+                self._idle[key] = queue.LifoQueue(maxsize=self.size)
+
+            return self._idle[key]
+
+    def get(self, scheme, netloc):
+        idle = self._queue((scheme, netloc))
+
+        while True:
+            try:
+                connection = idle.get_nowait()
+            except queue.Empty:
+                break
+
+            if not is_dropped(connection):
+                return connection, True
+
+            connection.close()
+
+        if scheme == 'https':
+            connection = http.client.HTTPSConnection(
+                netloc, timeout=self.timeout)
+        else:
+            connection = http.client.HTTPConnection(
+                netloc, timeout=self.timeout)
+
+        with self._lock:
+            self.opened += 1
+
+        return connection, False
+
+    def put(self, scheme, netloc, connection):
+        try:
+            self._queue((scheme, netloc)).put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def record(self, wire_bytes, decoded_bytes):
+        with self._lock:
+            self.requests += 1
+            self.wire_bytes += wire_bytes
+            self.decoded_bytes += decoded_bytes
+
+    def stats(self):
+        return {
+            'http_requests': self.requests,
+            'http_connections_opened': self.opened,
+            'http_wire_bytes': self.wire_bytes,
+            'http_decoded_bytes': self.decoded_bytes,
+        }
+
+
+class PooledTransport(Transport):
+    """
+    A suds transport that sends every request over a kept-alive
+    connection from a shared ConnectionPool, asks for gzip-compressed
+    replies and decompresses them as they are read. Counts the body
+    bytes received on the wire against the bytes they decoded to.
+
+    suds ties a transport to the options of one client, so each clone
+    needs its own instance, but they can all share one pool.
+    """
+
+    def __init__(self, pool, gzip=True):
+        super().__init__()
+        self.pool = pool
+        self.gzip = gzip
+
+    def open(self, request):
+        return io.BytesIO(self._send(request.url, 'GET', None,
+                                     request.headers).message)
+
+    def send(self, request):
+        return self._send(request.url, 'POST', request.message,
+                          request.headers)
+
+    def _send(self, url, method, body, headers):
+        parts = urlsplit(url)
+        path = parts.path or '/'
+
+        if parts.query:
+            path = '{}?{}'.format(path, parts.query)
+
+        headers = dict(headers)
+
+        if self.gzip:
+            headers['Accept-Encoding'] = 'gzip'
+
+        while True:
+            connection, reused = self.pool.get(parts.scheme, parts.netloc)
+            sent = False
+
+            # A stale kept-alive connection is only retried on a new one
+            # if the request never went out, or it was a GET.
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                sent = True
+                response = connection.getresponse()
+                message = self._read(response)
+
+            except STALE_CONNECTION_ERRORS as error:
+                connection.close()
+
+                if reused and (not sent or method == 'GET'):
+                    continue
+
+                if sent and method != 'GET':
+                    raise ReplyLost('Connection to {} dropped before the '
+                                    'reply arrived: {!r}'.format(
+                                        parts.netloc, error)) from error
+
+                raise
+
+            except BaseException:
+                connection.close()
+                raise
+
+            break
+
+        if response.will_close:
+            connection.close()
+        else:
+            self.pool.put(parts.scheme, parts.netloc, connection)
+
+        if response.status >= 300:
+            raise TransportError(response.reason, response.status,
+                                 io.BytesIO(message))
+
+        return Reply(response.status, dict(response.getheaders()), message)
+
+    def _read(self, response):
+        decoder = None
+
+        if response.getheader('Content-Encoding', '').lower() == 'gzip':
+            decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        chunks = []
+        wire_bytes = 0
+
+        while True:
+            chunk = response.read(CHUNK_SIZE)
+
+            if not chunk:
+                break
+
+            wire_bytes += len(chunk)
+
+            if decoder is not None:
+                chunk = decoder.decompress(chunk)
+
+            chunks.append(chunk)
+
+        if decoder is not None:
+            chunks.append(decoder.flush())
+
+        message = b''.join(chunks)
+        self.pool.record(wire_bytes, len(message))
+
+        return message
@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+import singer
+
+LOGGER = singer.get_logger()  # noqa
+
+
+# Bronto's read* calls return at most this many rows per page.
+PAGE_SIZE = 5000
+
+
+def hours(value):
+    return timedelta(hours=value)
+
+
+class WindowSizer:
+    """
+    Picks the size of the next date window from how full the previous
+    ones were. Windows double while they come back sparse (fewer than
+    `sparse_fraction` of a page) and halve once one fills a page or
+    spans more than `max_pages` pages, always staying between `minimum`
+    and `maximum`.
+    """
+
+    def __init__(self, table, size, minimum, maximum,
+                 max_pages=1, sparse_fraction=0.25):
+        self.table = table
+        self.minimum = minimum
+        self.maximum = maximum
+        self.size = min(max(size, minimum), maximum)
+        self.max_pages = max_pages
+        self.sparse_fraction = sparse_fraction
+
+    @classmethod
+    def from_config(cls, config, table, size, minimum, maximum):
+        overrides = config.get('window_sizes', {}).get(table, {})
+
+        return cls(
+            table,
+            hours(overrides.get('initial_hours', size / hours(1))),
+            hours(overrides.get('min_hours', minimum / hours(1))),
+            hours(overrides.get('max_hours', maximum / hours(1))),
+            max_pages=overrides.get('max_pages', 1),
+            sparse_fraction=overrides.get('sparse_fraction', 0.25))
+
+    def splittable(self, start, end):
+        return end - start > self.minimum
+
+    def observe(self, start, end, records, pages, largest_page):
+        span = end - start
+
+        if largest_page >= PAGE_SIZE or pages > self.max_pages:
+            size = min(self.size, max(span / 2, self.minimum))
+            reason = 'crowded'
+
+        elif records < PAGE_SIZE * self.sparse_fraction:
+            size = max(self.size, min(span * 2, self.maximum))
+            reason = 'sparse'
+
+        else:
+            return
+
+        if size != self.size:
+            LOGGER.info('{}: window {} to {} was {} ({} records in {} '
+                        'pages), resizing windows from {} to {}'.format(
+                            self.table, start, end, reason, records,
+                            pages, self.size, size))
+            self.size = size
@@ -0,0 +1,206 @@
+import collections
+import concurrent.futures
+import multiprocessing
+import uuid
+
+import singer
+
+from tap_bronto.client import CLIENT_POOL
+from tap_bronto.emitted import fingerprint, index_day
+from tap_bronto.output import get_encoder, record_prefix, RECORD_SUFFIX
+from tap_bronto.schemas import get_transformer
+from tap_bronto.streaming import row_parser
+
+LOGGER = singer.get_logger()  # noqa
+
+
+class PageJob:
+    """
+    Everything a worker process needs to turn a stream's raw pages into
+    encoded RECORD lines. Jobs are pickled with every page, so they only
+    hold plain data and a picklable `finish` step with a take_stats()
+    and merge() pair; the transformer is compiled once per worker and
+    cached.
+    """
+
+    def __init__(self, table, schema, flatten=(), finish=None,
+                 encoder='auto', key_properties=None, index_field=None,
+                 bookmark_field=None):
+        self.table = table
+        self.schema = schema
+        self.flatten = tuple(flatten)
+        self.finish = finish
+        self.encoder = encoder
+        self.key_properties = key_properties
+        self.index_field = index_field
+        self.bookmark_field = bookmark_field
+
+        # Identifies the job across pickling, so workers can tell it's
+        # one they have already compiled.
+        self.token = uuid.uuid4().hex
+
+
+class EncodedPage:
+    """
+    A page of records already encoded as Singer RECORD lines. `keys`
+    holds each record's primary key values when the stream audits
+    duplicates, and `index_keys` each record's day and fingerprint when
+    it keeps an emitted index; both are None otherwise. `stats` holds
+    what the job's finish step counted, to be merged back into the
+    stream's copy, and `last_value` the bookmark field of the page's last
+    record, if the job asked for it.
+    """
+
+    def __init__(self, lines, keys=None, stats=None, index_keys=None,
+                 last_value=None):
+        self.lines = lines
+        self.keys = keys
+        self.stats = stats
+        self.index_keys = index_keys
+        self.last_value = last_value
+
+    def __len__(self):
+        return len(self.lines)
+
+    @property
+    def data(self):
+        return b''.join(self.lines)
+
+    def select(self, positions):
+        def pick(values):
+            if values is None:
+                return None
+
+            return [values[position] for position in positions]
+
+        return EncodedPage(pick(self.lines), pick(self.keys), self.stats,
+                           pick(self.index_keys), self.last_value)
+
+
+def encode_records(records, prefix, dumps, key_properties=None,
+                   index_field=None, stats=None, bookmark_field=None):
+    lines = [prefix + dumps(record) + RECORD_SUFFIX for record in records]
+
+    keys = None
+    index_keys = None
+    last_value = None
+
+    if key_properties is not None:
+        keys = [tuple(record.get(key) for key in key_properties)
+                for record in records]
+
+    if index_field is not None:
+        index_keys = [(index_day(record.get(index_field)), fingerprint(line))
+                      for record, line in zip(records, lines)]
+
+    if bookmark_field is not None and records:
+        last_value = records[-1].get(bookmark_field)
+
+    return EncodedPage(lines, keys, stats, index_keys, last_value)
+
+
+_COMPILED = {}
+
+
+def compile_job(job):
+    if job.token not in _COMPILED:
+        _COMPILED[job.token] = (
+            get_transformer(job.schema, flatten=job.flatten),
+            get_encoder(job.encoder),
+            record_prefix(job.table))
+
+    return _COMPILED[job.token]
+
+
+def encode_page(job, operation, body, skip=None):
+    """
+    Runs in a worker: parses a raw reply, transforms its rows and
+    encodes the records.
+    """
+    transform, dumps, prefix = compile_job(job)
+    parser = row_parser(CLIENT_POOL.base(), operation)
+
+    records = [transform(row) for row in parser.rows(body, skip)]
+    stats = None
+
+    if job.finish is not None:
+        records = job.finish(records)
+        stats = job.finish.take_stats()
+
+    return encode_records(records, prefix, dumps, job.key_properties,
+                          job.index_field, stats, job.bookmark_field)
+
+
+def initialize(config):
+    if config.get('cassette_mode') == 'record':
+        # Only the main process sends requests worth recording, and
+        # only it writes the cassette.
+        config = dict(config, cassette=None)
+
+    CLIENT_POOL.configure(config)
+
+
+class WorkerPool:
+    """
+    An optional pool of worker processes that transform and encode raw
+    pages, so parsing, transforming and JSON encoding aren't bound to
+    the one core the main process runs on. Results come back in the
+    order the pages were read, and the main process only writes the
+    encoded bytes.
+    """
+
+    def __init__(self):
+        self.workers = 0
+        self.executor = None
+
+    @property
+    def enabled(self):
+        return self.executor is not None
+
+    def start(self, workers, config):
+        if workers < 1:
+            return
+
+        LOGGER.info('Transforming pages on {} worker processes.'
+                    .format(workers))
+
+        self.workers = workers
+
+        # Worker processes build their own SOAP client, so spawn them
+        # fresh instead of forking a process that has threads running.
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=initialize,
+            initargs=(config,))
+
+    def map_pages(self, job, pages):
+        """
+        Sends each RawPage in `pages` to a worker, yielding EncodedPages
+        in the same order. At most two pages per worker are in flight.
+        """
+        pending = collections.deque()
+
+        try:
+            for page in pages:
+                pending.append(self.executor.submit(
+                    encode_page, job, page.parser.operation, page.body,
+                    page.skip))
+
+                if len(pending) >= self.workers * 2:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+WORKERS = WorkerPool()
@@ -0,0 +1,72 @@
+import os
+import types
+
+import pytest
+import suds.client
+
+from benchmarks.mock_server import build_wsdl
+from tap_bronto.endpoints.activity import cover_partitions, ActivityStream
+from tap_bronto.streaming import RawPage, RowParser
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+OPERATION = 'readRecentOutboundActivities'
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as handle:
+        return handle.read()
+
+
+def client(path):
+    return suds.client.Client('file://' + path, cache=None)
+
+
+def stream(client):
+    return types.SimpleNamespace(
+        client=client, SEARCH_REQUEST='recentOutboundActivitySearchRequest')
+
+
+def test_known_types_left_out_get_a_partition():
+    assert cover_partitions([['send'], ['open', 'click']],
+                            ['send', 'open', 'click', 'bounce']) == \
+        [['send'], ['open', 'click'], ['bounce']]
+
+
+def test_no_partition_added_when_every_type_is_listed():
+    assert cover_partitions([['send', 'bounce'], ['open', 'click']],
+                            ['send', 'open', 'click', 'bounce']) == \
+        [['send', 'bounce'], ['open', 'click']]
+
+
+def test_catch_all_partition_without_known_types():
+    assert cover_partitions([['send'], ['open', 'click']]) == \
+        [['send'], ['open', 'click'], None]
+
+
+def test_activity_types_from_an_enumerating_wsdl(tmp_path):
+    path = tmp_path / 'bronto.wsdl'
+    path.write_text(build_wsdl('http://127.0.0.1:8999/v4'))
+
+    assert ActivityStream.activity_types(stream(client(str(path)))) == \
+        ['send', 'open', 'click', 'bounce']
+
+
+def test_activity_types_from_a_plain_wsdl():
+    path = os.path.join(FIXTURES, 'bronto.wsdl')
+
+    assert ActivityStream.activity_types(stream(client(path))) is None
+
+
+@pytest.mark.parametrize('skip, expected', [
+    (None, ['send', 'bounce', 'sms_send']),
+    ({'activityType': {'send'}}, ['bounce', 'sms_send']),
+    ({'activityType': {'send', 'bounce', 'sms_send'}}, []),
+])
+def test_raw_page_drops_skipped_types(skip, expected):
+    parser = RowParser(client(os.path.join(FIXTURES, 'bronto.wsdl')),
+                       OPERATION)
+    page = RawPage(fixture(OPERATION + '.xml'), parser, skip=skip)
+
+    assert [row.activityType for row in page] == expected
+    assert len(page) == 3
@@ -0,0 +1,38 @@
+import hashlib
+
+from funcy import identity, project
+
+from tap_bronto.ids import ActivityIds
+
+RECORDS = [
+    {'createdDate': '2026-01-01T00:00:00+00:00', 'activityType': 'open',
+     'contactId': 'c1', 'listId': 'l1', 'segmentId': 's1',
+     'keywordId': 'k1', 'messageId': 'm1', 'deliveryId': 'd1'},
+    {'createdDate': '2026-01-01T00:00:01+00:00', 'activityType': 'send',
+     'contactId': 'c2', 'listId': None, 'segmentId': '',
+     'keywordId': None, 'messageId': 'm2'},
+    {'activityType': 'click', 'contactId': 'c3', 'messageId': 'm3',
+     'createdDate': '2026-01-01T00:00:02+00:00'},
+    {'createdDate': '2026-01-01T00:00:03+00:00', 'activityType': 'bounce',
+     'contactId': 'São Paulo'},
+]
+
+
+def baseline_id(result):
+    """
+    The id the activity streams built before ActivityIds existed.
+    """
+    ids = ['createdDate', 'activityType', 'contactId',
+           'listId', 'segmentId', 'keywordId', 'messageId']
+
+    return hashlib.md5(
+        '|'.join(filter(identity,
+                        project(result, ids).values()))
+        .encode('utf-8')).hexdigest()
+
+
+def test_default_ids_match_baseline():
+    expected = [baseline_id(record) for record in RECORDS]
+    records = ActivityIds()([dict(record) for record in RECORDS])
+
+    assert [record['id'] for record in records] == expected
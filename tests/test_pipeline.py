@@ -0,0 +1,53 @@
+import concurrent.futures
+import time
+
+from tap_bronto.pipeline import Prefetch
+
+
+def counted(read, total):
+    for number in range(total):
+        read.append(number)
+        yield number
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_prefetch_starts_reading_right_away():
+    read = []
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        pages = Prefetch(counted(read, 10), 2, executor)
+        wait_for(lambda: len(read) >= 3)
+
+        assert list(pages) == list(range(10))
+
+
+def test_prefetch_only_buffers_depth_pages():
+    read = []
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        pages = Prefetch(counted(read, 100), 2, executor)
+        wait_for(lambda: len(read) >= 3)
+        time.sleep(0.2)
+
+        # Two pages in the buffer, and one the producer waits to put.
+        assert len(read) == 3
+
+        pages.close()
+
+
+def test_closing_prefetch_stops_its_producer():
+    def endless():
+        while True:
+            yield 'page'
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        pages = Prefetch(endless(), 2, executor)
+        pages.close()
+
+    assert pages.producer.done()
@@ -0,0 +1,86 @@
+import types
+
+import pytest
+import suds
+
+from tap_bronto.session import fault_code, is_session_fault, \
+    SessionExpired, SessionHeaderPlugin, SessionManager
+
+
+def web_fault(faultstring):
+    fault = types.SimpleNamespace(faultstring=faultstring)
+
+    return suds.WebFault(fault, None)
+
+
+@pytest.mark.parametrize('faultstring, code', [
+    ('102: Invalid session', 102),
+    ('116: End of result set', 116),
+    (' 303 : Invalid filter', 303),
+    ('Invalid session', None),
+    ('', None),
+])
+def test_fault_code(faultstring, code):
+    assert fault_code(web_fault(faultstring)) == code
+
+
+@pytest.mark.parametrize('faultstring, expired', [
+    ('102: Invalid session', True),
+    ('303: The sessionId field is invalid for this filter', False),
+    ('116: End of result set', False),
+])
+def test_only_session_codes_are_session_faults(faultstring, expired):
+    assert is_session_fault(web_fault(faultstring)) is expired
+
+
+class Client:
+
+    def __init__(self):
+        self.logins = 0
+        self.service = types.SimpleNamespace(login=self.login)
+        self.options = types.SimpleNamespace(plugins=[])
+
+    def login(self, token):
+        self.logins += 1
+        return 'session-{}'.format(self.logins)
+
+
+def client_with_header():
+    client = Client()
+    client.options.plugins.append(SessionHeaderPlugin('ns'))
+
+    return client
+
+
+def test_max_age_from_a_json_string():
+    sessions = SessionManager(max_age='1200')
+    client = Client()
+
+    assert sessions.session_id(client, 'token') == 'session-1'
+    assert sessions.session_id(client, 'token') == 'session-1'
+
+
+def test_other_faults_are_not_retried():
+    sessions = SessionManager()
+    calls = []
+
+    def invoke():
+        calls.append(1)
+        raise web_fault('303: The sessionId field is invalid')
+
+    with pytest.raises(suds.WebFault):
+        sessions.invoke(client_with_header(), 'token', 'readContacts',
+                        invoke)
+
+    assert len(calls) == 1
+
+
+def test_pinned_session_faults_raise():
+    sessions = SessionManager()
+
+    def invoke():
+        raise web_fault('102: Invalid session')
+
+    with pytest.raises(SessionExpired):
+        sessions.invoke(client_with_header(), 'token', 'readContacts',
+                        invoke, session_id='session-0')
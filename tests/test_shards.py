@@ -0,0 +1,66 @@
+import pytest
+
+from tap_bronto.shards import merge_ranges, merge_states
+
+
+def entry(start, end, last_record, shard=None):
+    value = {'start': start, 'end': end}
+
+    if shard is not None:
+        value['shard'] = shard
+
+    return {'field': 'createdDate', 'last_record': last_record,
+            'range': value}
+
+
+def state(*entries):
+    return {'bookmarks': {'inbound_activity': entry(*entries)}}
+
+
+def test_contiguous_shards_merge_to_the_last_end():
+    merged = merge_states([
+        state('2026-01-03', '2026-01-05', '2026-01-05', '1/2'),
+        state('2026-01-01', '2026-01-03', '2026-01-03', '0/2'),
+    ])
+
+    assert merged == {'bookmarks': {'inbound_activity': {
+        'field': 'createdDate',
+        'last_record': '2026-01-05T00:00:00Z',
+    }}}
+
+
+def test_overlapping_ranges_merge():
+    assert merge_ranges('inbound_activity', [
+        entry('2026-01-01', '2026-01-04', '2026-01-04'),
+        entry('2026-01-02', '2026-01-06', '2026-01-06'),
+    ]) == '2026-01-06T00:00:00Z'
+
+
+def test_gap_stops_the_bookmark():
+    assert merge_ranges('inbound_activity', [
+        entry('2026-01-01', '2026-01-02', '2026-01-02'),
+        entry('2026-01-03', '2026-01-04', '2026-01-04'),
+    ]) == '2026-01-02T00:00:00Z'
+
+
+def test_incomplete_range_stops_the_bookmark():
+    assert merge_ranges('inbound_activity', [
+        entry('2026-01-01', '2026-01-03', '2026-01-02T12:00:00Z', '0/3'),
+        entry('2026-01-03', '2026-01-05', '2026-01-05', '1/3'),
+        entry('2026-01-05', '2026-01-07', '2026-01-07', '2/3'),
+    ]) == '2026-01-02T12:00:00Z'
+
+
+def test_incomplete_range_inside_an_overlap_keeps_the_furthest():
+    assert merge_ranges('inbound_activity', [
+        entry('2026-01-01', '2026-01-04', '2026-01-04'),
+        entry('2026-01-02', '2026-01-06', '2026-01-03'),
+    ]) == '2026-01-04T00:00:00Z'
+
+
+def test_missing_shard_fails():
+    with pytest.raises(RuntimeError):
+        merge_states([
+            state('2026-01-01', '2026-01-03', '2026-01-03', '0/3'),
+            state('2026-01-05', '2026-01-07', '2026-01-07', '2/3'),
+        ])
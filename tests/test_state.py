@@ -0,0 +1,128 @@
+from tap_bronto.output import Writer
+from tap_bronto.state import StateManager
+from tap_bronto.stream import Stream
+
+RANGE = {'start': '2026-01-01T00:00:00Z', 'end': '2026-01-05T00:00:00Z',
+         'shard': '0/2'}
+
+
+class StateWriter(Writer):
+
+    def __init__(self):
+        super().__init__()
+        self.states = []
+
+    def write_state(self, state):
+        self.states.append(state)
+
+
+class BookmarkStream(Stream):
+
+    TABLE = 'contact'
+
+
+def last_record(state):
+    return state['bookmarks']['contact']['last_record']
+
+
+def ranged_state():
+    return {'bookmarks': {'contact': {
+        'field': 'modified',
+        'last_record': '2026-01-05T00:00:00Z',
+        'range': dict(RANGE),
+    }}}
+
+
+def test_unranged_run_drops_range():
+    manager = StateManager(ranged_state())
+    manager.incorporate('contact', 'modified', '2026-01-06T00:00:00Z')
+
+    assert manager.snapshot()['bookmarks']['contact'] == {
+        'field': 'modified',
+        'last_record': '2026-01-06T00:00:00Z',
+    }
+
+
+def test_ranged_run_keeps_range():
+    manager = StateManager()
+    manager.start_range('contact', 'modified', dict(RANGE))
+    manager.incorporate('contact', 'modified', '2026-01-03T00:00:00Z')
+
+    bookmark = manager.snapshot()['bookmarks']['contact']
+
+    assert bookmark['last_record'] == '2026-01-03T00:00:00Z'
+    assert bookmark['range'] == RANGE
+
+
+def test_offsets_compare_as_instants():
+    manager = StateManager({'bookmarks': {'contact': {
+        'field': 'modified', 'last_record': '2026-01-01T00:00:00Z'}}})
+
+    manager.incorporate('contact', 'modified', '2026-01-01T00:30:00+01:00')
+    assert last_record(manager.snapshot()) == '2026-01-01T00:00:00Z'
+
+    manager.incorporate('contact', 'modified', '2026-01-01T01:30:00+01:00')
+    assert last_record(manager.snapshot()) == '2026-01-01T00:30:00Z'
+
+
+def test_fractional_seconds_compare_by_value():
+    manager = StateManager({'bookmarks': {'contact': {
+        'field': 'modified', 'last_record': '2026-01-01T00:00:00Z'}}})
+
+    manager.incorporate('contact', 'modified', '2025-12-31T23:59:59.999Z')
+    assert not manager.dirty
+
+    manager.incorporate('contact', 'modified', '2026-01-01T00:00:01.250Z')
+    assert manager.dirty
+    assert last_record(manager.snapshot()) == '2026-01-01T00:00:01Z'
+
+    manager.incorporate('contact', 'modified', '2026-01-01T00:00:01.100Z')
+    assert manager.watermark('contact').microsecond == 250000
+
+
+def test_every_move_is_written_without_checkpoint_settings():
+    writer = StateWriter()
+    manager = StateManager(checkpoint_seconds=0, checkpoint_records=0)
+
+    for hour in range(3):
+        manager.incorporate('contact', 'modified',
+                            '2026-01-01T0{}:00:00Z'.format(hour))
+        manager.checkpoint(writer)
+
+    manager.checkpoint(writer)
+
+    assert [last_record(state) for state in writer.states] == [
+        '2026-01-01T00:00:00Z',
+        '2026-01-01T01:00:00Z',
+        '2026-01-01T02:00:00Z',
+    ]
+
+
+def test_checkpoint_waits_for_records():
+    writer = StateWriter()
+    manager = StateManager(checkpoint_records=10)
+
+    manager.incorporate('contact', 'modified', '2026-01-01T00:00:00Z')
+    manager.checkpoint(writer, records=6)
+    assert writer.states == []
+
+    manager.incorporate('contact', 'modified', '2026-01-01T01:00:00Z')
+    manager.checkpoint(writer, records=6)
+    assert [last_record(state) for state in writer.states] == [
+        '2026-01-01T01:00:00Z']
+
+
+def test_closing_stream_writes_its_last_bookmark():
+    writer = StateWriter()
+    manager = StateManager(checkpoint_seconds=3600)
+
+    stream = BookmarkStream(writer=writer, state_manager=manager)
+    stream.save_bookmark('modified', '2026-01-01T00:00:00Z')
+    stream.save_bookmark('modified', '2026-01-01T01:00:00Z')
+
+    assert writer.states == []
+
+    stream.close()
+
+    assert [last_record(state) for state in writer.states] == [
+        '2026-01-01T01:00:00Z']
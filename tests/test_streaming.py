@@ -0,0 +1,147 @@
+import os
+
+import pytest
+import suds.client
+
+from suds.client import SoapClient
+
+from tap_bronto.schemas import get_transformer, ACTIVITY_SCHEMA, \
+    CONTACT_SCHEMA
+from tap_bronto.streaming import RawPage, RowParser
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+ACTIVITY_OPERATIONS = ['readRecentOutboundActivities',
+                       'readRecentInboundActivities']
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as handle:
+        return handle.read()
+
+
+def selected(schema):
+    """
+    `schema` with every field selected, as a catalog would have it.
+    """
+    properties = {}
+
+    for field, field_schema in schema['properties'].items():
+        metadata = dict(field_schema.get('metadata', {}))
+        metadata['selected'] = True
+        properties[field] = dict(field_schema, metadata=metadata)
+
+    return dict(schema, properties=properties)
+
+
+def suds_rows(client, operation, body):
+    """
+    Unmarshals `body` the way Stream.send does without `fast_parse`.
+    """
+    method = getattr(client.service, operation).method
+
+    return SoapClient(client, method).succeeded(method.binding.input, body)
+
+
+@pytest.fixture(scope='module')
+def client():
+    return suds.client.Client(
+        'file://' + os.path.join(FIXTURES, 'bronto.wsdl'), cache=None)
+
+
+@pytest.fixture(scope='module')
+def transform_contact():
+    return get_transformer(selected(CONTACT_SCHEMA),
+                           flatten=['readOnlyContactData'])
+
+
+@pytest.fixture(scope='module')
+def transform_activity():
+    return get_transformer(selected(ACTIVITY_SCHEMA))
+
+
+def test_contacts_match_suds(client, transform_contact):
+    body = fixture('readContacts.xml')
+
+    expected = [transform_contact(row)
+                for row in suds_rows(client, 'readContacts', body)]
+    records = [transform_contact(row)
+               for row in RowParser(client, 'readContacts').rows(body)]
+
+    assert len(records) == 3
+    assert records == expected
+
+
+@pytest.mark.parametrize('operation', ACTIVITY_OPERATIONS)
+def test_activities_match_suds(client, transform_activity, operation):
+    body = fixture(operation + '.xml')
+
+    expected = [transform_activity(row)
+                for row in suds_rows(client, operation, body)]
+    records = [transform_activity(row)
+               for row in RowParser(client, operation).rows(body)]
+
+    assert len(records) == 3
+    assert records == expected
+
+
+def test_nil_and_empty_values(client):
+    rows = list(RowParser(client, 'readContacts').rows(
+        fixture('readContacts.xml')))
+
+    assert rows[0].mobileNumber is None
+    assert rows[0].customSource is None
+    assert rows[0].readOnlyContactData.numBounces is None
+    assert rows[0].readOnlyContactData.lastOrderDate is None
+    assert rows[2].msgPref is None
+    assert not hasattr(rows[2], 'customSource')
+
+
+def test_repeated_fields_are_lists(client):
+    rows = list(RowParser(client, 'readContacts').rows(
+        fixture('readContacts.xml')))
+
+    assert rows[0].listIds == ['0bc403ec000000000000000000000003b1f7',
+                               '0bc403ec000000000000000000000003b1f9']
+    assert rows[0].SMSKeywordIDs == ['0bc4064f000000000000000000000000012b']
+    assert rows[1].listIds == ['0bc403ec000000000000000000000003b1f7']
+    assert not hasattr(rows[2], 'listIds')
+
+
+def test_nested_read_only_contact_data(client, transform_contact):
+    rows = list(RowParser(client, 'readContacts').rows(
+        fixture('readContacts.xml')))
+
+    assert rows[0].readOnlyContactData.numSends == 12.0
+    assert rows[0].readOnlyContactData.geoIPCity == 'São Paulo'
+    assert not hasattr(rows[1], 'readOnlyContactData')
+
+    record = transform_contact(rows[0])
+
+    assert record['geoIPCity'] == 'São Paulo'
+    assert record['lastOpenDate'] == '2018-06-29T08:12:40+00:00'
+    assert record['numBounces'] is None
+
+
+@pytest.mark.parametrize('name', [
+    'readContacts.xml',
+    'readRecentOutboundActivities.xml',
+    'readRecentInboundActivities.xml',
+])
+def test_raw_page_length(client, name):
+    operation = name[:-len('.xml')]
+    page = RawPage(fixture(name), RowParser(client, operation))
+
+    assert len(page) == 3
+    assert len(list(page)) == len(page)
+
+
+def test_empty_raw_page(client):
+    body = (b'<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/'
+            b'envelope/"><soap:Body><ns2:readContactsResponse xmlns:ns2='
+            b'"http://api.bronto.com/v4"/></soap:Body></soap:Envelope>')
+    page = RawPage(body, RowParser(client, 'readContacts'))
+
+    assert len(page) == 0
+    assert not page
+    assert list(page) == []
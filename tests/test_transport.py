@@ -0,0 +1,109 @@
+import http.server
+import threading
+
+import pytest
+
+from tap_bronto.transport import ConnectionPool, PooledTransport, ReplyLost
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """
+    Answers each POST with its number, over a kept-alive connection,
+    except that it closes the connection after reading the POSTs
+    numbered in `server.drop`, and after answering those in
+    `server.close_after`.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.server.posts += 1
+        number = self.server.posts
+
+        if number in self.server.drop:
+            self.close_connection = True
+            return
+
+        body = str(number).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+        if number in self.server.close_after:
+            self.close_connection = True
+
+
+class Server(http.server.ThreadingHTTPServer):
+    """
+    Sets `closed` each time it has closed a connection.
+    """
+
+    def shutdown_request(self, request):
+        super().shutdown_request(request)
+        self.closed.set()
+
+
+@pytest.fixture
+def server():
+    server = Server(('127.0.0.1', 0), Handler)
+    server.closed = threading.Event()
+    server.daemon_threads = True
+    server.posts = 0
+    server.drop = set()
+    server.close_after = set()
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def post(transport, server):
+    return transport._send(
+        'http://127.0.0.1:{}/v4'.format(server.server_address[1]),
+        'POST', b'<envelope/>', {'Content-Type': 'text/xml'})
+
+
+def test_reuses_connections(server):
+    pool = ConnectionPool()
+    transport = PooledTransport(pool, gzip=False)
+
+    assert [post(transport, server).message for _ in range(3)] == \
+        [b'1', b'2', b'3']
+    assert pool.opened == 1
+
+
+def test_replaces_a_connection_closed_while_idle(server):
+    server.close_after.add(1)
+
+    pool = ConnectionPool()
+    transport = PooledTransport(pool, gzip=False)
+
+    assert post(transport, server).message == b'1'
+    assert server.closed.wait(5)
+    assert post(transport, server).message == b'2'
+    assert server.posts == 2
+    assert pool.opened == 2
+
+
+def test_does_not_resend_a_post_whose_reply_was_lost(server):
+    server.drop.add(2)
+
+    pool = ConnectionPool()
+    transport = PooledTransport(pool, gzip=False)
+
+    assert post(transport, server).message == b'1'
+
+    with pytest.raises(ReplyLost):
+        post(transport, server)
+
+    assert server.posts == 2
+    assert post(transport, server).message == b'3'
@@ -0,0 +1,100 @@
+import pytest
+
+from datetime import datetime, timedelta, timezone
+
+from tap_bronto.endpoints.contact import ContactStream
+from tap_bronto.output import Writer
+from tap_bronto.stream import Stream
+from tap_bronto.windows import PAGE_SIZE
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+HOUR = timedelta(hours=1)
+HOURLY_RECORDS = [100, 100, 3000, 3000, 10, 10]
+
+HOUR_SIZES = {'window_sizes': {'contact': {
+    'initial_hours': 6, 'min_hours': 1, 'max_hours': 36}}}
+
+
+def test_contact_day_windows_round_hour_sizes_up():
+    sizer = ContactStream(dict(HOUR_SIZES)).window_sizer()
+
+    assert sizer.size == timedelta(days=1)
+    assert sizer.minimum == timedelta(days=1)
+    assert sizer.maximum == timedelta(days=2)
+
+
+def test_contact_hour_windows_keep_hour_sizes():
+    sizer = ContactStream(dict(HOUR_SIZES, contact_window_mode='hour')) \
+        .window_sizer()
+
+    assert sizer.size == timedelta(hours=6)
+    assert sizer.minimum == timedelta(hours=1)
+    assert sizer.maximum == timedelta(hours=36)
+
+
+class RecordingWriter(Writer):
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def write_records(self, stream, records):
+        self.records.extend(records)
+
+    def write_state(self, state):
+        pass
+
+
+class HourlyStream(Stream):
+    """
+    Serves `HOURLY_RECORDS[hour]` records for each hour after `START`.
+    """
+
+    TABLE = 'hourly'
+    WINDOW = timedelta(hours=2)
+    MIN_WINDOW = timedelta(hours=1)
+    MAX_WINDOW = timedelta(hours=2)
+
+    def __init__(self, config):
+        super().__init__(dict(config, sync_end='2026-01-01T06:00:00Z',
+                              prefetch_pages=0),
+                         writer=RecordingWriter())
+        self.reads = []
+
+    def read_window(self, start, end):
+        self.reads.append(((start - START) // HOUR, (end - START) // HOUR))
+
+        rows = [{'hour': hour, 'row': row}
+                for hour in range((start - START) // HOUR,
+                                  (end - START) // HOUR)
+                for row in range(HOURLY_RECORDS[hour])]
+
+        for offset in range(0, len(rows), PAGE_SIZE):
+            yield rows[offset:offset + PAGE_SIZE]
+
+        yield []
+
+    def transform_page(self, results):
+        return results
+
+
+@pytest.mark.parametrize('max_parallel_windows', [1, 2])
+def test_crowded_window_is_read_again_split(max_parallel_windows):
+    stream = HourlyStream({'max_parallel_windows': max_parallel_windows})
+    stream.sync_windows(START, 'created')
+
+    assert stream.reads[:2] == [(0, 2), (2, 4)]
+    assert (2, 3) in stream.reads and (3, 4) in stream.reads
+    assert len(stream.writer.records) == sum(HOURLY_RECORDS)
+    assert len(set((record['hour'], record['row'])
+                   for record in stream.writer.records)) == \
+        sum(HOURLY_RECORDS)
+
+
+def test_smallest_window_is_not_split():
+    stream = HourlyStream({'window_sizes': {'hourly': {
+        'initial_hours': 1, 'min_hours': 1, 'max_hours': 1}}})
+    stream.sync_windows(START, 'created')
+
+    assert stream.reads == [(hour, hour + 1) for hour in range(6)]
+    assert len(stream.writer.records) == sum(HOURLY_RECORDS)